@@ -0,0 +1,7 @@
+'''
+Author: Jason Shi
+Date: 19-10-2026 15:10:27
+Last Editors: Jason
+Contact Last Editors: D23090120503@cityu.edu.mo
+LastEditTime: 19-10-2026 15:10:27
+'''
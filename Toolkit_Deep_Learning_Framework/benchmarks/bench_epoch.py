@@ -0,0 +1,52 @@
+'''
+Author: Jason Shi
+Date: 19-10-2026 15:10:27
+Last Editors: Jason
+Contact Last Editors: D23090120503@cityu.edu.mo
+LastEditTime: 19-10-2026 15:10:27
+'''
+
+#! Short end-to-end train() + evaluate() epoch on synthetic data.
+import time
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import DataLoader, TensorDataset
+from utils.utils_datasets import DATASET_INFO
+from utils.utils_networks import get_network
+from utils.utils_train import train
+from utils.utils_evaluate import evaluate
+from benchmarks.common import synthetic_tensors
+
+
+def run(network='ConvNet', dataset='CIFAR10', train_size=2048, test_size=1024, device='cpu'):
+    '''
+    @param:
+    network(str): get_network name
+    dataset(str): dataset giving the input shape and number of classes
+    train_size(int): synthetic training samples (batch size 128, as get_dataset)
+    test_size(int): synthetic test samples (batch size 256, as get_dataset)
+    device(str): CPU or GPU(cuda)
+
+    @return:
+    results(dict): 'epoch/<network>/<dataset>' -> {'train_time', 'evaluate_time', 'train_samples_per_s'}
+    '''
+    channel, im_size, num_classes = DATASET_INFO[dataset]
+    train_loader = DataLoader(TensorDataset(*synthetic_tensors(dataset, train_size)),
+                              batch_size=128, shuffle=True, num_workers=0)
+    test_loader = DataLoader(TensorDataset(*synthetic_tensors(dataset, test_size, seed=1)),
+                             batch_size=256, shuffle=False, num_workers=0)
+    model = get_network(network, channel=channel, num_classes=num_classes,
+                        input_size=im_size, dist=False).to(device)
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.parameters(), lr=0.001)
+
+    start = time.perf_counter()
+    train(model, device, train_loader, criterion, optimizer, 1, 1)
+    train_time = time.perf_counter() - start
+    start = time.perf_counter()
+    evaluate(model, device, test_loader, criterion, 1, 1)
+    evaluate_time = time.perf_counter() - start
+
+    print(f'epoch {network} {dataset} | train {train_time:.2f}s | evaluate {evaluate_time:.2f}s')
+    return {f'epoch/{network}/{dataset}': {'train_time': train_time, 'evaluate_time': evaluate_time,
+                                            'train_samples_per_s': train_size / train_time}}
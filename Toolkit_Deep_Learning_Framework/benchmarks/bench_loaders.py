@@ -0,0 +1,62 @@
+'''
+Author: Jason Shi
+Date: 19-10-2026 15:10:27
+Last Editors: Jason
+Contact Last Editors: D23090120503@cityu.edu.mo
+LastEditTime: 19-10-2026 15:10:27
+'''
+
+#! Loader throughput of each get_dataset configuration.
+import os
+import time
+from torch.utils.data import DataLoader
+from utils.utils_datasets import DATASET_INFO, get_dataset
+from benchmarks.common import synthetic_dataset
+
+# folder checked to decide whether the real data of get_dataset is available offline
+_DATA_DIRS = {'MNIST': 'MNIST', 'CIFAR10': 'cifar-10-batches-py', 'CIFAR100': 'cifar-100-python',
+              'Tiny': 'tiny-imagenet-200', 'SVHN': 'train_32x32.mat'}
+
+
+def loader_throughput(loader, max_batches):
+    '''
+    @return:
+    samples_per_s(float): samples per second over max_batches batches, the worker start-up is included
+    '''
+    samples = 0
+    start = time.perf_counter()
+    for batch_idx, (inputs, _) in enumerate(loader):
+        samples += inputs.size(0)
+        if batch_idx + 1 == max_batches:
+            break
+    return samples / (time.perf_counter() - start)
+
+
+def run(datasets=None, data_path='./data', num_workers=(0, 2), batch_size=128, max_batches=20):
+    '''
+    @param:
+    datasets(list): dataset names, default every dataset of get_dataset
+    data_path(str): get_dataset data folder, datasets missing there are replaced by synthetic data
+    num_workers(list): worker counts to measure (get_dataset uses 2)
+    batch_size(int): training batch size (get_dataset uses 128)
+    max_batches(int): batches per measurement
+
+    @return:
+    results(dict): 'loader/<dataset>/workers<n>' -> {'samples_per_s', 'synthetic'}
+    '''
+    results = {}
+    for dataset in datasets or list(DATASET_INFO):
+        synthetic = not os.path.exists(os.path.join(data_path, _DATA_DIRS[dataset]))
+        if synthetic:
+            dst_train = synthetic_dataset(dataset, batch_size * max_batches)
+        else:
+            dst_train = get_dataset(dataset, data_path)[0].dataset
+        for workers in num_workers:
+            loader = DataLoader(dst_train, batch_size=batch_size,
+                                shuffle=True, num_workers=workers)
+            samples_per_s = loader_throughput(loader, max_batches)
+            results[f'loader/{dataset}/workers{workers}'] = {
+                'samples_per_s': samples_per_s, 'synthetic': synthetic}
+            print(f'loader {dataset:>9} | workers {workers} | {samples_per_s:10.1f} samples/s'
+                  f'{" (synthetic)" if synthetic else ""}')
+    return results
@@ -0,0 +1,58 @@
+'''
+Author: Jason Shi
+Date: 19-10-2026 15:10:27
+Last Editors: Jason
+Contact Last Editors: D23090120503@cityu.edu.mo
+LastEditTime: 19-10-2026 15:10:27
+'''
+
+#! Forward/backward throughput and memory of every get_network model.
+import time
+import torch
+from utils.utils_datasets import DATASET_INFO
+from utils.utils_networks import NETWORK_NAMES, get_network, measure_train_step
+
+
+def forward_throughput(net, inputs, repeats):
+    with torch.no_grad():
+        net(inputs)
+        if inputs.is_cuda:
+            torch.cuda.synchronize()
+        start = time.perf_counter()
+        for _ in range(repeats):
+            net(inputs)
+        if inputs.is_cuda:
+            torch.cuda.synchronize()
+    return inputs.size(0) * repeats / (time.perf_counter() - start)
+
+
+def run(networks=None, dataset='CIFAR10', batch_sizes=(32, 128), device='cpu', repeats=3):
+    '''
+    @param:
+    networks(list): get_network names, default every name
+    dataset(str): dataset giving the input shape and number of classes
+    batch_sizes(list): batch sizes to measure
+    device(str): CPU or GPU(cuda)
+    repeats(int): timed steps per measurement
+
+    @return:
+    results(dict): 'network/<name>/<dataset>/bs<n>' -> {'forward_samples_per_s', 'train_samples_per_s', 'memory'}
+    where memory is the cuda peak on GPU and the activations saved for backward on CPU
+    '''
+    channel, im_size, num_classes = DATASET_INFO[dataset]
+    results = {}
+    for name in networks or NETWORK_NAMES:
+        net = get_network(name, channel=channel, num_classes=num_classes,
+                          input_size=im_size, dist=False).to(device)
+        for batch_size in batch_sizes:
+            inputs = torch.randn(batch_size, channel, *im_size, device=device)
+            net.eval()
+            forward = forward_throughput(net, inputs, repeats)
+            net.train()
+            memory, step_time = measure_train_step(net, inputs, repeats)
+            results[f'network/{name}/{dataset}/bs{batch_size}'] = {
+                'forward_samples_per_s': forward, 'train_samples_per_s': batch_size / step_time, 'memory': memory}
+            print(f'network {name:>13} | batch {batch_size:>4} | forward {forward:9.1f} samples/s | '
+                  f'train {batch_size / step_time:9.1f} samples/s | memory {memory / 2**20:8.1f}MB')
+        del net
+    return results
@@ -0,0 +1,75 @@
+'''
+Author: Jason Shi
+Date: 19-10-2026 15:10:27
+Last Editors: Jason
+Contact Last Editors: D23090120503@cityu.edu.mo
+LastEditTime: 19-10-2026 15:10:27
+'''
+
+#! Shared helpers of the benchmark suite: synthetic stand-in datasets and result files.
+import json
+import os
+import platform
+import time
+import torch
+import torchvision
+import torchvision.transforms as transforms
+from torchvision import datasets
+from utils.utils_datasets import DATASET_INFO
+
+
+def synthetic_dataset(dataset, size, transform=True):
+    '''
+    @Description: Stand-in for a get_dataset dataset when it cannot be downloaded: random PIL images with the same
+    shape and number of classes, decoded and normalized per sample like the real ones.
+
+    @param:
+    dataset(str): the name of the dataset (a key of DATASET_INFO)
+    size(int): the number of samples
+    transform(bool): apply ToTensor + Normalize, as get_dataset does
+
+    @return:
+    dst(Dataset): the synthetic dataset
+    '''
+    channel, im_size, num_classes = DATASET_INFO[dataset]
+    transform = transforms.Compose([transforms.ToTensor(), transforms.Normalize(
+        [0.5] * channel, [0.5] * channel)]) if transform else None
+    return datasets.FakeData(size=size, image_size=(channel, *im_size), num_classes=num_classes,
+                             transform=transform, random_offset=0)
+
+
+def synthetic_tensors(dataset, size, seed=0):
+    '''
+    @return:
+    images(Tensor), labels(Tensor): random normalized images and labels with the shape of the dataset
+    '''
+    channel, im_size, num_classes = DATASET_INFO[dataset]
+    generator = torch.Generator().manual_seed(seed)
+    images = torch.randn(size, channel, *im_size, generator=generator)
+    labels = torch.randint(0, num_classes, (size,), generator=generator)
+    return images, labels
+
+
+def environment():
+    return {
+        'time': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
+        'host': platform.node(),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'torchvision': torchvision.__version__,
+        'threads': torch.get_num_threads(),
+        'cpus': os.cpu_count(),
+        'cuda': torch.cuda.get_device_name(0) if torch.cuda.is_available() else None,
+    }
+
+
+def save_results(results, path):
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2)
+    print(f'Results saved to {path}')
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)['results']
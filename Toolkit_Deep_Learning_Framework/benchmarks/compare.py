@@ -0,0 +1,60 @@
+'''
+Author: Jason Shi
+Date: 19-10-2026 15:10:27
+Last Editors: Jason
+Contact Last Editors: D23090120503@cityu.edu.mo
+LastEditTime: 19-10-2026 15:10:27
+'''
+
+#! Compare benchmark results with a stored baseline and flag regressions, e.g.
+#! python -m benchmarks.compare baseline.json benchmark_results.json --threshold 0.1
+import argparse
+import sys
+from benchmarks.common import load_results
+
+
+def compare(baseline, current, threshold=0.1):
+    '''
+    @param:
+    baseline(dict): results of the baseline run
+    current(dict): results of the new run
+    threshold(float): relative change tolerated before a metric is flagged
+
+    @return:
+    regressions(list): (benchmark, metric, baseline value, current value, relative change)
+    '''
+    regressions = []
+    for key in sorted(set(baseline) & set(current)):
+        for metric, old in baseline[key].items():
+            new = current[key].get(metric)
+            if isinstance(old, bool) or not isinstance(old, (int, float)) or new is None or old == 0:
+                continue
+            change = (new - old) / old
+            # throughputs should not go down, times and memory should not go up
+            higher_is_better = metric.endswith('per_s')
+            regressed = change < -threshold if higher_is_better else change > threshold
+            flag = 'REGRESSION' if regressed else ''
+            print(f'{key:<45} {metric:<22} {old:12.2f} -> {new:12.2f} ({100. * change:+6.1f}%) {flag}')
+            if regressed:
+                regressions.append((key, metric, old, new, change))
+    for key in sorted(set(baseline) ^ set(current)):
+        print(f'{key:<45} only in {"baseline" if key in baseline else "current"}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare Benchmark Results')
+    parser.add_argument('baseline', type=str, help='baseline result file')
+    parser.add_argument('current', type=str, help='new result file')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative change flagged as a regression')
+    args = parser.parse_args()
+
+    regressions = compare(load_results(args.baseline),
+                          load_results(args.current), args.threshold)
+    print(f'{len(regressions)} regression(s)')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+'''
+Author: Jason Shi
+Date: 19-10-2026 15:10:27
+Last Editors: Jason
+Contact Last Editors: D23090120503@cityu.edu.mo
+LastEditTime: 19-10-2026 15:10:27
+'''
+
+#! Run the benchmark suite and save the results as JSON, e.g.
+#! python -m benchmarks.run --suites loaders networks epoch --output results.json
+import argparse
+import torch
+from benchmarks import bench_loaders, bench_networks, bench_epoch
+from benchmarks.common import save_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark Suite')
+    parser.add_argument('--suites', type=str, nargs='+', default=['loaders', 'networks', 'epoch'],
+                        choices=['loaders', 'networks', 'epoch'], help='benchmarks to run')
+    parser.add_argument('--output', type=str,
+                        default='benchmark_results.json', help='result file')
+    parser.add_argument('--data_path', type=str, default='./data',
+                        help='path to the datasets, missing ones are synthetic')
+    parser.add_argument('--datasets', type=str, nargs='+',
+                        default=None, help='datasets of the loader benchmark')
+    parser.add_argument('--num_workers', type=int, nargs='+',
+                        default=[0, 2], help='loader worker counts')
+    parser.add_argument('--networks', type=str, nargs='+',
+                        default=None, help='networks of the network benchmark')
+    parser.add_argument('--dataset', type=str, default='CIFAR10',
+                        help='input shape of the network and epoch benchmarks')
+    parser.add_argument('--batch_sizes', type=int, nargs='+',
+                        default=[32, 128], help='batch sizes of the network benchmark')
+    parser.add_argument('--epoch_network', type=str,
+                        default='ConvNet', help='network of the epoch benchmark')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='timed steps per measurement')
+    parser.add_argument('--device', type=str, default='cpu', help='device')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    results = {}
+    if 'loaders' in args.suites:
+        results.update(bench_loaders.run(args.datasets, data_path=args.data_path,
+                                         num_workers=args.num_workers))
+    if 'networks' in args.suites:
+        results.update(bench_networks.run(args.networks, dataset=args.dataset, batch_sizes=args.batch_sizes,
+                                          device=args.device, repeats=args.repeats))
+    if 'epoch' in args.suites:
+        results.update(bench_epoch.run(args.epoch_network,
+                       dataset=args.dataset, device=args.device))
+    save_results(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
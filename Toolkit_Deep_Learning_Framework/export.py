@@ -0,0 +1,74 @@
+'''
+Author: Jason Shi
+Date: 19-10-2026 10:40:18
+Last Editors: Jason
+Contact Last Editors: D23090120503@cityu.edu.mo
+LastEditTime: 19-10-2026 10:40:18
+'''
+
+#! export.py which exports a checkpoint saved by main.py to TorchScript and ONNX and benchmarks the exported runtimes.
+
+
+from utils.utils_datasets import get_dataset_info
+from utils.utils_export import load_model, export_torchscript, export_onnx, get_runtimes, validate_runtimes, benchmark_runtimes
+import torch
+import argparse
+import json
+import os
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Model Export Script')
+    parser.add_argument('--checkpoint', type=str,
+                        default='best_model.pth', help='state_dict saved by main.py')
+    parser.add_argument('--dataset', type=str,
+                        default='MNIST', help='dataset the model was trained on')
+    parser.add_argument('--network', type=str, default='MLP', help='networks')
+    parser.add_argument('--data_path', type=str,
+                        default='./data', help='path to the dataset (only read for custom folder datasets)')
+    parser.add_argument('--output_dir', type=str,
+                        default='./exported', help='directory of the exported models')
+    parser.add_argument('--batch_sizes', type=int, nargs='+',
+                        default=[1, 8, 32, 128], help='batch sizes to benchmark')
+    parser.add_argument('--opset', type=int, default=17, help='ONNX opset')
+    parser.add_argument('--repeats', type=int, default=20,
+                        help='timed runs per batch size')
+    parser.add_argument('--device', type=str, default='cpu', help='device')
+    parser.add_argument('--atol', type=float, default=1e-4,
+                        help='max absolute difference of the exported logits with eager')
+    args = parser.parse_args()
+
+    channel, im_size, num_classes = get_dataset_info(args.dataset, args.data_path)
+    model = load_model(args.checkpoint, args.network, channel=channel, num_classes=num_classes,
+                       input_size=im_size, device=args.device)
+    example = torch.randn(2, channel, *im_size, device=args.device)
+
+    # export, the batch dimension of the ONNX graph is dynamic
+    os.makedirs(args.output_dir, exist_ok=True)
+    torchscript_path = os.path.join(args.output_dir, f'{args.network}.pt')
+    onnx_path = os.path.join(args.output_dir, f'{args.network}.onnx')
+    export_torchscript(model, example, torchscript_path)
+    print(f'TorchScript saved to {torchscript_path}')
+    export_onnx(model, example, onnx_path, opset_version=args.opset)
+    print(f'ONNX saved to {onnx_path}')
+
+    # check the exported models against eager on a batch size different from the example
+    runtimes = get_runtimes(model, torchscript_path, onnx_path)
+    errors = validate_runtimes(runtimes, torch.randn(
+        5, channel, *im_size, device=args.device), atol=args.atol)
+    mismatch = [name for name, error in errors.items() if error > args.atol]
+    if mismatch:
+        # do not leave exported models that disagree with the trained one
+        for path in (torchscript_path, onnx_path):
+            os.remove(path)
+        exit('exported outputs differ from eager: %s' % ', '.join(mismatch))
+
+    results = benchmark_runtimes(runtimes, (channel, *im_size), batch_sizes=args.batch_sizes,
+                                 device=args.device, repeats=args.repeats)
+    with open(os.path.join(args.output_dir, f'{args.network}_benchmark.json'), 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
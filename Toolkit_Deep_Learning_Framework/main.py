@@ -9,10 +9,20 @@ LastEditTime: 10-02-2025 10:43:15
 #! main.py which is responsible for parsing the arguments and calling the training and evaluation functions.
 
 
-from utils.utils_datasets import get_dataset
-from utils.utils_networks import get_network
+from utils.utils_datasets import get_dataset, get_dataset_info
+from utils.utils_batch_size import find_batch_size
+from utils.utils_augment import BatchAugment, AUGMENTATIONS
+from utils.utils_networks import get_network, activation_checkpoint_report, select_norm_backend, NORM_BACKENDS
 from utils.utils_train import train
 from utils.utils_evaluate import evaluate
+from utils.utils_export import load_model
+from utils.utils_checkpoint import save_checkpoint
+from utils.utils_timing import StepTimer
+from utils import utils_metrics
+from utils.utils_distill import KDLoss, TeacherLogitsDataset, get_teacher_logits, file_hash
+from utils.utils_prefetch import Prefetcher
+from utils.utils_resident import load_tensor_dataset, ResidentLoader
+from torch.utils.data import DataLoader
 import wandb
 from torchvision.utils import save_image
 import torch.optim as optim
@@ -51,56 +61,212 @@ def main():
     parser.add_argument('--network', type=str, default='MLP', help='networks')
     parser.add_argument('--epochs', type=int, default=10, help='epochs')
     parser.add_argument('--batch_size', type=int,
-                        default=64, help='batch_size')
+                        default=128, help='batch_size')
+    parser.add_argument('--find_batch_size', action='store_true',
+                        help='probe the model and train with the throughput-optimal batch size')
+    parser.add_argument('--scale_lr', action='store_true',
+                        help='with --find_batch_size, scale the learning rate linearly from --batch_size')
     parser.add_argument('--learning_rate', type=float,
                         default=0.001, help='learning rate')
     parser.add_argument('--num_workers', type=int,
-                        default=4, help='num_workers')
+                        default=2, help='num_workers')
+    parser.add_argument('--decode_threads', type=int, default=None,
+                        help='image decode threads per process for folder datasets (default: number of cores / num_workers)')
     parser.add_argument('--device', type=str, default='cuda', help='device')
     parser.add_argument('--data_path', type=str,
                         default='./data', help='path to the dataset')
+    parser.add_argument('--augment', type=str, nargs='*', default=[], choices=AUGMENTATIONS,
+                        help='batch augmentations of the training set, applied in this order (cutout erases to black, '
+                             'only mixup with --teacher)')
+    parser.add_argument('--augment_on', type=str, default='loader', choices=['loader', 'device'],
+                        help='augment in the loader workers or on the training device')
+    parser.add_argument('--checkpoint_activations', type=int, default=0,
+                        help='recompute ResNet50/101/152 activations every k blocks (0: off, -1: whole stage)')
+    parser.add_argument('--teacher', type=str, default=None,
+                        help='checkpoint of a trained teacher, enables knowledge distillation')
+    parser.add_argument('--teacher_network', type=str,
+                        default='ResNet18', help='network of the teacher')
+    parser.add_argument('--teacher_cache', type=str, default=None,
+                        help='file of the cached teacher logits')
+    parser.add_argument('--kd_temperature', type=float,
+                        default=4.0, help='distillation temperature')
+    parser.add_argument('--kd_alpha', type=float, default=0.9,
+                        help='weight of the distillation loss')
+    parser.add_argument('--save_format', type=str, default='pth', choices=['pth', 'safetensors'],
+                        help='format of the best model checkpoint')
+    parser.add_argument('--save_dtype', type=str, default='float32', choices=['float32', 'float16', 'bfloat16'],
+                        help='dtype of the weights stored in a safetensors checkpoint')
+    parser.add_argument('--timing', action='store_true',
+                        help='record the data-wait/transfer/forward/backward/optimizer/logging time of each step')
+    parser.add_argument('--timing_sync', action='store_true',
+                        help='synchronize cuda after each phase for an exact GPU breakdown')
+    parser.add_argument('--trace_file', type=str, default=None,
+                        help='write the step timeline as a Chrome trace (implies --timing)')
+    parser.add_argument('--profile_steps', type=int, nargs=2, default=None, metavar=('N', 'M'),
+                        help='run torch.profiler over training steps N to M (implies --timing)')
+    parser.add_argument('--metrics_sink', type=str, default='wandb', choices=['wandb', 'file', 'none'],
+                        help='where the metrics are written, from a background thread')
+    parser.add_argument('--metrics_file', type=str, default='metrics.jsonl',
+                        help='.jsonl or .csv file of the file sink')
+    parser.add_argument('--log_every', type=int, default=0,
+                        help='log the training loss every n steps (0: epoch metrics only)')
+    parser.add_argument('--eval_cache', type=str, default=None,
+                        help='folder caching the test logits of the saved best model, for rescore.py')
+    parser.add_argument('--extended_metrics', action='store_true',
+                        help='also log top-5 accuracy and calibration error of the test set')
+    parser.add_argument('--norm_backend', type=str, default='groupnorm', choices=NORM_BACKENDS,
+                        help='instance norm kernel of the instancenorm models')
+    parser.add_argument('--prefetch', type=int, default=0,
+                        help='batches moved to the device in the background ahead of the loop, 0 to disable')
+    parser.add_argument('--channels_last', action='store_true',
+                        help='channels last memory format of the model and the (prefetched) inputs')
+    parser.add_argument('--train_tensors', type=str, default=None,
+                        help='train from this tensor file (images, labels or soft labels) kept on the device '
+                             'instead of the training split, the test split of --dataset is still used')
     args = parser.parse_args()
 
-    # init wandb
-    wandb.init(project="deep-learning-project", config={
+    # init wandb (only for the run config unless it is the metrics sink) and the metrics logger
+    wandb.init(project="deep-learning-project", mode=None if args.metrics_sink == 'wandb' else 'disabled', config={
         "dataset": args.dataset,
         "network": args.network,
         "epochs": args.epochs,
         "batch_size": args.batch_size,
         "learning_rate": args.learning_rate,
-        "num_workers": args.num_workers
+        "num_workers": args.num_workers,
+        "augment": args.augment
     })
 
     config = wandb.config
+    utils_metrics.init_metrics(args.metrics_sink, args.metrics_file)
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
 
+    # find the batch size (and learning rate) before loading the dataset
+    if args.find_batch_size:
+        channel, im_size, num_classes = get_dataset_info(args.dataset, args.data_path)
+        result = find_batch_size(config.network, channel, im_size, num_classes, device=device,
+                                 base_lr=args.learning_rate, base_batch_size=args.batch_size,
+                                 norm_backend=args.norm_backend)
+        args.batch_size = result['best_batch_size']
+        if args.scale_lr:
+            args.learning_rate = result['best_lr']
+        wandb.config.update({'batch_size': args.batch_size, 'learning_rate': args.learning_rate},
+                            allow_val_change=True)
+
+    # the cached teacher logits are those of the un-augmented images, only mixup mixes them with the images
+    if args.teacher is not None and set(args.augment) - {'mixup'}:
+        exit('unknown augmentation with --teacher: %s, only mixup keeps the teacher logits consistent'
+             % ', '.join(op for op in args.augment if op != 'mixup'))
+
     # get the dataset
+    augment_on = 'device' if args.train_tensors is not None else args.augment_on
+    augment = BatchAugment(args.augment, where=augment_on) if args.augment else None
     train_loader, test_loader, channel, im_size, num_classes = get_dataset(
-        args.dataset, args.data_path)
+        args.dataset, args.data_path, batch_size=args.batch_size, num_workers=args.num_workers,
+        decode_threads=args.decode_threads, augment=augment, train=args.train_tensors is None)
+
+    # resident training set, e.g. a distilled one, indexed directly on the device
+    if args.train_tensors is not None:
+        images, labels = load_tensor_dataset(args.train_tensors)
+        if tuple(images.shape[1:]) != (channel, *im_size) or (labels.dim() == 2 and labels.size(1) != num_classes):
+            exit('unknown tensor dataset shape for %s: %s' % (args.dataset, tuple(images.shape)))
+        train_loader = ResidentLoader(images, labels, batch_size=args.batch_size, device=device)
+        wandb.config.update({'train_tensors': args.train_tensors, 'train_size': images.size(0)})
 
     # get the network model
     model = get_network(config.network, channel=channel,
-                        input_size=im_size, num_classes=num_classes).to(device)
+                        input_size=im_size, num_classes=num_classes,
+                        checkpoint_activations=args.checkpoint_activations, norm_backend=args.norm_backend).to(device)
+    if args.channels_last:
+        model = model.to(memory_format=torch.channels_last)
+    if args.norm_backend == 'auto':
+        # benchmarked once, for the training batches, before any step is timed
+        select_norm_backend(model, (args.batch_size, channel, *im_size), device=device)
+    if args.checkpoint_activations != 0:
+        report = activation_checkpoint_report(
+            model, channel, im_size, batch_size=train_loader.batch_size, device=device)
+        wandb.config.update({'checkpoint_activations': args.checkpoint_activations})
+        utils_metrics.log({'Activation Memory Saved': report['memory_saved'],
+                           'Activation Extra Compute': report['extra_compute']})
 
     # define the loss function and optimizer
     criterion = nn.CrossEntropyLoss().to(args.device)
     optimizer = optim.Adam(model.parameters(), lr=config.learning_rate)
 
+    # knowledge distillation, the teacher logits are computed once and cached on disk
+    train_criterion = criterion
+    if args.teacher is not None:
+        teacher = load_model(args.teacher, args.teacher_network, channel=channel, num_classes=num_classes,
+                             input_size=im_size, device=device)
+        # the cache is keyed by the training data content, distilled sets often share their file name
+        data_key = f'{args.dataset}-train' if args.train_tensors is None else file_hash(args.train_tensors)
+        train_name = args.dataset if args.train_tensors is None else f'{args.dataset}_{data_key[:12]}'
+        cache_path = args.teacher_cache or os.path.join(
+            args.data_path, f'teacher_logits_{train_name}_{args.teacher_network}.pt')
+        logits = get_teacher_logits(teacher, args.teacher, train_loader.dataset, device, cache_path, data_key,
+                                    num_workers=train_loader.num_workers)
+        del teacher
+        if args.train_tensors is not None:
+            train_loader = ResidentLoader(images, labels, logits, batch_size=args.batch_size, device=device)
+        else:
+            train_loader = DataLoader(TeacherLogitsDataset(train_loader.dataset, logits),
+                                      batch_size=train_loader.batch_size, shuffle=True,
+                                      num_workers=train_loader.num_workers, collate_fn=train_loader.collate_fn)
+        train_criterion = KDLoss(temperature=args.kd_temperature, alpha=args.kd_alpha)
+        wandb.config.update({'teacher_network': args.teacher_network, 'kd_temperature': args.kd_temperature,
+                             'kd_alpha': args.kd_alpha})
+
+    # prepare the next batches on the device while the current one is computed
+    if args.prefetch > 0:
+        memory_format = torch.channels_last if args.channels_last else None
+        if args.train_tensors is None:
+            train_loader = Prefetcher(train_loader, device, depth=args.prefetch, memory_format=memory_format)
+        test_loader = Prefetcher(test_loader, device, depth=args.prefetch, memory_format=memory_format)
+
+    # step timing
+    timing = args.timing or args.trace_file is not None or args.profile_steps is not None
+    train_timer = StepTimer('train', enabled=timing, sync=args.timing_sync,
+                            trace=args.trace_file is not None, profile_steps=args.profile_steps)
+    test_timer = StepTimer('test', enabled=timing, sync=args.timing_sync,
+                           trace=args.trace_file is not None)
+
     # training and testing
     best_acc = 0.0
     for epoch in range(1, config.epochs + 1):
         train_loss, train_acc = train(
-            model, device, train_loader, criterion, optimizer, epoch, config.epochs)
+            model, device, train_loader, train_criterion, optimizer, epoch, config.epochs, timer=train_timer,
+            log_every=args.log_every, augment=augment if augment_on == 'device' else None)
         test_loss, test_acc = evaluate(
-            model, device, test_loader, criterion, epoch, config.epochs, phase='Test')
+            model, device, test_loader, criterion, epoch, config.epochs, phase='Test', timer=test_timer,
+            extended=args.extended_metrics)[:2]
+        if timing:
+            summary = train_timer.report()
+            test_timer.report()
+            utils_metrics.log({f'Train {k} ms': v for k, v in summary.items() if not k.endswith('_frac')})
 
         # save the best model
+        best_path = 'best_model.safetensors' if args.save_format == 'safetensors' else 'best_model.pth'
         if test_acc > best_acc:
             best_acc = test_acc
-            torch.save(model.state_dict(), 'best_model.pth')
+            if args.save_format == 'safetensors':
+                save_checkpoint(model, best_path, config.network, channel, num_classes,
+                                input_size=im_size, dtype=getattr(torch, args.save_dtype))
+            else:
+                torch.save(model.state_dict(), best_path)
+
+    # cache the test logits of the saved model only, loaded as rescore.py does so that it finds them
+    if args.eval_cache is not None and best_acc > 0:
+        best_model = load_model(best_path, config.network, channel=channel, num_classes=num_classes,
+                                input_size=im_size, device=device)
+        evaluate(best_model, device, test_loader, criterion, config.epochs, config.epochs, phase='Best',
+                 cache_dir=args.eval_cache, split=f'{args.dataset}-test')
+        del best_model
+
+    if args.trace_file is not None:
+        train_timer.dump_trace(args.trace_file, test_timer)
+        print(f"Step timeline saved to {args.trace_file}")
 
     # log device info
-    wandb.log({'GPU': torch.cuda.get_device_name(0)})
+    utils_metrics.log({'GPU': torch.cuda.get_device_name(0) if torch.cuda.is_available() else 'cpu'})
 
     # print the training and testing results
     print(f"Epoch: {epoch}/{config.epochs}, Train Loss: {train_loss:.4f}, Train Acc: {
@@ -109,6 +275,7 @@ def main():
     end_time = time.time()
     print("END:{}".format(get_time()))
     print("TRAINING TIME: {:.2f} seconds".format(end_time - start_time))
+    utils_metrics.finish()
     wandb.finish()
 
 
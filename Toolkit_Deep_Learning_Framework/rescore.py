@@ -0,0 +1,68 @@
+'''
+Author: Jason Shi
+Date: 19-10-2026 17:20:44
+Last Editors: Jason
+Contact Last Editors: D23090120503@cityu.edu.mo
+LastEditTime: 19-10-2026 17:20:44
+'''
+
+#! rescore.py which computes the extended test metrics of saved checkpoints, reusing the cached logits when the
+#! same checkpoint was already evaluated.
+
+
+from utils.utils_datasets import get_dataset_info, get_dataset
+from utils.utils_export import load_model
+from utils.utils_evaluate import evaluate, eval_cache_path
+import torch.nn as nn
+import torch
+import argparse
+import json
+import os
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Checkpoint Scoring Script')
+    parser.add_argument('--checkpoints', type=str, nargs='+',
+                        default=['best_model.pth'], help='checkpoints (.pth or .safetensors)')
+    parser.add_argument('--dataset', type=str,
+                        default='MNIST', help='datasets')
+    parser.add_argument('--network', type=str, default='MLP', help='networks')
+    parser.add_argument('--data_path', type=str,
+                        default='./data', help='path to the dataset')
+    parser.add_argument('--cache_dir', type=str,
+                        default='./eval_cache', help='folder of the cached logits')
+    parser.add_argument('--topk', type=int, nargs='+',
+                        default=[1, 5], help='k of the top-k accuracies')
+    parser.add_argument('--output', type=str, default=None,
+                        help='JSON file of the metrics')
+    args = parser.parse_args()
+
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    channel, im_size, num_classes = get_dataset_info(args.dataset, args.data_path)
+    criterion = nn.CrossEntropyLoss()
+    split = f'{args.dataset}-test'
+    test_loader = None
+    scores = {}
+    for checkpoint in args.checkpoints:
+        model = load_model(checkpoint, args.network, channel=channel, num_classes=num_classes,
+                           input_size=im_size, device=device)
+        # the dataset is only loaded when a checkpoint is not in the cache yet
+        if test_loader is None and not os.path.exists(eval_cache_path(model, args.cache_dir, split)):
+            test_loader = get_dataset(args.dataset, args.data_path)[1]
+        print(f'Checkpoint: {checkpoint}')
+        _, _, metrics = evaluate(model, device, test_loader, criterion, 1, 1, cache_dir=args.cache_dir,
+                                 split=split, extended=True, topk=tuple(args.topk))
+        per_class = metrics['per_class_accuracy']
+        print(f'Per-class accuracy: min {per_class.min():.2f}% (class {per_class.argmin()}), '
+              f'max {per_class.max():.2f}% (class {per_class.argmax()})')
+        scores[checkpoint] = {k: v.tolist() if torch.is_tensor(v) else v for k, v in metrics.items()}
+
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(scores, f)
+        print(f'Metrics saved to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
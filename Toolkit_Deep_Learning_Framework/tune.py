@@ -0,0 +1,70 @@
+'''
+Author: Jason Shi
+Date: 19-10-2026 22:15:30
+Last Editors: Jason
+Contact Last Editors: D23090120503@cityu.edu.mo
+LastEditTime: 19-10-2026 22:15:30
+'''
+
+#! tune.py which searches a grid of configurations in parallel processes and stops the poor ones early with ASHA.
+
+
+from utils.utils_asha import run_search
+import itertools
+import argparse
+import json
+import os
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='ASHA Hyper-parameter Search Script')
+    parser.add_argument('--dataset', type=str,
+                        default='MNIST', help='datasets')
+    parser.add_argument('--networks', type=str, nargs='+',
+                        default=['MLP'], help='networks to search')
+    parser.add_argument('--learning_rates', type=float, nargs='+',
+                        default=[0.01, 0.003, 0.001, 0.0003], help='learning rates to search')
+    parser.add_argument('--batch_sizes', type=int, nargs='+',
+                        default=[128], help='batch sizes to search')
+    parser.add_argument('--min_epochs', type=int, default=1,
+                        help='epochs of every trial before the first pruning')
+    parser.add_argument('--max_epochs', type=int, default=27,
+                        help='epochs of the trials that are never pruned')
+    parser.add_argument('--eta', type=int, default=3,
+                        help='reduction factor, 1/eta of the trials of a rung are promoted')
+    parser.add_argument('--workers', type=int, default=2,
+                        help='trials trained in parallel')
+    parser.add_argument('--num_workers', type=int,
+                        default=2, help='num_workers of each trial')
+    parser.add_argument('--val_fraction', type=float, default=0.1,
+                        help='share of the training set held out for validation')
+    parser.add_argument('--data_path', type=str,
+                        default='./data', help='path to the dataset')
+    parser.add_argument('--output_dir', type=str, default='./asha',
+                        help='folder of the trial checkpoints and results')
+    args = parser.parse_args()
+
+    configs = [{'dataset': args.dataset, 'network': network, 'learning_rate': lr, 'batch_size': batch_size,
+                'num_workers': args.num_workers}
+               for network, lr, batch_size in itertools.product(args.networks, args.learning_rates, args.batch_sizes)]
+    history, scheduler = run_search(configs, args.output_dir, data_path=args.data_path, workers=args.workers,
+                                    min_epochs=args.min_epochs, max_epochs=args.max_epochs, eta=args.eta,
+                                    val_fraction=args.val_fraction)
+
+    trial, accuracy = scheduler.best()
+    if trial is None:
+        exit('every trial failed')
+    if history[trial][-1][0] < scheduler.rungs[-1]:
+        print(f'Warning: the best trial only trained {history[trial][-1][0]} of {scheduler.rungs[-1]} epochs')
+    print(f"Best trial {trial}: {configs[trial]}, validation accuracy {accuracy:.2f}% "
+          f"after {history[trial][-1][0]} epochs, checkpoint {os.path.join(args.output_dir, f'trial_{trial}.pth')}")
+    with open(os.path.join(args.output_dir, 'results.json'), 'w') as f:
+        json.dump({'rungs': scheduler.rungs, 'best_trial': trial,
+                   'failed': sorted({t for failed in scheduler.failed for t in failed}),
+                   'trials': [{'config': config, 'history': history[i]} for i, config in enumerate(configs)]},
+                  f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+'''
+Author: Jason Shi
+Date: 19-10-2026 21:40:03
+Last Editors: Jason
+Contact Last Editors: D23090120503@cityu.edu.mo
+LastEditTime: 19-10-2026 21:40:03
+'''
+
+#! This module is responsible for multi-trial hyper-parameter search with asynchronous successive halving (ASHA):
+#! every trial first trains for min_epochs, only the best 1/eta of each rung is promoted to eta times more epochs,
+#! resuming from its checkpoint (at least the best one once the rung is complete), and the trials run in parallel
+#! processes.
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import DataLoader, random_split
+
+
+class ASHAScheduler:
+    '''
+    @param:
+    num_trials(int): the number of configurations
+    min_epochs(int): epochs of the first rung
+    max_epochs(int): epochs of the last rung
+    eta(int): reduction factor, 1/eta of the trials of a rung are promoted to the next one
+    '''
+
+    def __init__(self, num_trials, min_epochs=1, max_epochs=27, eta=3):
+        self.num_trials = num_trials
+        self.eta = eta
+        self.rungs = [min_epochs]
+        while self.rungs[-1] * eta < max_epochs:
+            self.rungs.append(self.rungs[-1] * eta)
+        if self.rungs[-1] < max_epochs:
+            self.rungs.append(max_epochs)
+        self.scores = [{} for _ in self.rungs]  # rung -> {trial: validation accuracy}
+        self.failed = [set() for _ in self.rungs]
+        self.promoted = [set() for _ in self.rungs]
+        self.next_trial = 0
+
+    def _complete(self, rung):
+        # every trial that can still reach the rung has reported to it
+        reported = len(self.scores[rung]) + len(self.failed[rung])
+        if rung == 0:
+            return self.next_trial == self.num_trials and reported == self.num_trials
+        return (self._complete(rung - 1) and len(self.promoted[rung - 1]) >= self._quota(rung - 1)
+                and reported == len(self.promoted[rung - 1]))
+
+    def _quota(self, rung):
+        # a rung with fewer than eta trials still promotes its best one when it is complete, so that the search
+        # always reaches max_epochs
+        quota = len(self.scores[rung]) // self.eta
+        if quota == 0 and self.scores[rung] and self._complete(rung):
+            quota = 1
+        return quota
+
+    def get_job(self):
+        '''
+        @return:
+        job(tuple): (trial, rung, start epoch, end epoch), None if no job can start now
+        '''
+        # promote first, from the highest rung: a trial in the top 1/eta of a rung goes to the next one
+        for rung in reversed(range(len(self.rungs) - 1)):
+            scores = self.scores[rung]
+            top = sorted(scores, key=scores.get, reverse=True)[:self._quota(rung)]
+            for trial in top:
+                if trial not in self.promoted[rung]:
+                    self.promoted[rung].add(trial)
+                    return trial, rung + 1, self.rungs[rung], self.rungs[rung + 1]
+        if self.next_trial < self.num_trials:
+            self.next_trial += 1
+            return self.next_trial - 1, 0, 0, self.rungs[0]
+        return None
+
+    def report(self, trial, rung, accuracy):
+        self.scores[rung][trial] = accuracy
+
+    def fail(self, trial, rung):
+        # a crashed trial is never promoted, but the rung can still complete without it
+        self.failed[rung].add(trial)
+
+    def best(self):
+        # the best trial of the highest rung reached
+        for scores in reversed(self.scores):
+            if scores:
+                trial = max(scores, key=scores.get)
+                return trial, scores[trial]
+        return None, None
+
+
+def run_trial(trial, config, start_epoch, end_epoch, checkpoint_dir, data_path, val_fraction=0.1, threads=None):
+    '''
+    @Description: Train one trial from start_epoch to end_epoch, resuming from its checkpoint, and evaluate it on a
+    held-out part of the training set after each epoch. Runs in a worker process.
+
+    @param:
+    trial(int): trial index
+    config(dict): dataset, network, learning_rate and batch_size of the trial
+    start_epoch(int): epochs already trained (a checkpoint exists if > 0)
+    end_epoch(int): epochs trained when the job ends
+    checkpoint_dir(str): folder of the trial checkpoints
+    data_path(str): path to the dataset
+    val_fraction(float): share of the training set held out for validation
+    threads(int): torch threads of the process
+
+    @return:
+    accuracies(list): (epoch, validation accuracy) of each trained epoch
+    '''
+    from utils.utils_datasets import get_dataset
+    from utils.utils_networks import get_network
+    from utils.utils_train import train
+    from utils.utils_evaluate import evaluate
+
+    if threads:
+        torch.set_num_threads(threads)
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    train_loader, _, channel, im_size, num_classes = get_dataset(
+        config['dataset'], data_path, batch_size=config['batch_size'], num_workers=config.get('num_workers', 2))
+
+    # the same split for every trial and job
+    num_val = int(len(train_loader.dataset) * val_fraction)
+    dst_train, dst_val = random_split(train_loader.dataset, [len(train_loader.dataset) - num_val, num_val],
+                                      generator=torch.Generator().manual_seed(0))
+    num_workers = train_loader.num_workers
+    train_loader = DataLoader(dst_train, batch_size=config['batch_size'], shuffle=True, num_workers=num_workers)
+    val_loader = DataLoader(dst_val, batch_size=256, shuffle=False, num_workers=num_workers)
+
+    model = get_network(config['network'], channel=channel, num_classes=num_classes,
+                        input_size=im_size, dist=False).to(device)
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(model.parameters(), lr=config['learning_rate'])
+    checkpoint = os.path.join(checkpoint_dir, f'trial_{trial}.pth')
+    if start_epoch > 0:
+        state = torch.load(checkpoint, map_location=device)
+        model.load_state_dict(state['model'])
+        optimizer.load_state_dict(state['optimizer'])
+
+    accuracies = []
+    for epoch in range(start_epoch + 1, end_epoch + 1):
+        train(model, device, train_loader, criterion, optimizer, epoch, end_epoch)
+        _, val_acc = evaluate(model, device, val_loader, criterion, epoch, end_epoch, phase='Validation')
+        accuracies.append((epoch, val_acc))
+
+    torch.save({'model': model.state_dict(), 'optimizer': optimizer.state_dict(), 'epoch': end_epoch,
+                'config': config}, checkpoint)
+    return accuracies
+
+
+def run_search(configs, checkpoint_dir, data_path='./data', workers=2, min_epochs=1, max_epochs=27, eta=3,
+               val_fraction=0.1):
+    '''
+    @param:
+    configs(list): dicts with dataset, network, learning_rate and batch_size, one per trial
+    checkpoint_dir(str): folder of the trial checkpoints
+    data_path(str): path to the dataset
+    workers(int): the number of trials trained in parallel
+    min_epochs(int): epochs of the first rung
+    max_epochs(int): epochs of the last rung
+    eta(int): reduction factor
+    val_fraction(float): share of the training set held out for validation
+
+    @return:
+    history(dict): trial -> list of (epoch, validation accuracy)
+    scheduler(ASHAScheduler): rung scores and failed trials, scheduler.best() gives the best trial
+    '''
+    from utils.utils_datasets import get_dataset
+
+    # download and extract once, the workers would race on the same data_path
+    for dataset in sorted({config['dataset'] for config in configs}):
+        get_dataset(dataset, data_path, num_workers=0)
+
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    scheduler = ASHAScheduler(len(configs), min_epochs=min_epochs, max_epochs=max_epochs, eta=eta)
+    history = {trial: [] for trial in range(len(configs))}
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f'ASHA rungs (epochs): {scheduler.rungs}, {len(configs)} trials, {workers} workers')
+
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        running = {}
+        while True:
+            while len(running) < workers:
+                job = scheduler.get_job()
+                if job is None:
+                    break
+                trial, rung, start_epoch, end_epoch = job
+                print(f'Trial {trial} {configs[trial]}: epochs {start_epoch + 1}-{end_epoch} (rung {rung})')
+                future = pool.submit(run_trial, trial, configs[trial], start_epoch, end_epoch, checkpoint_dir,
+                                     data_path, val_fraction, threads)
+                running[future] = job
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                trial, rung, _, _ = running.pop(future)
+                try:
+                    history[trial] += future.result()
+                except (Exception, SystemExit) as e:
+                    # the other trials go on, get_network and get_dataset exit() on bad configs
+                    scheduler.fail(trial, rung)
+                    print(f'Trial {trial}: rung {rung} failed: {e!r}')
+                    continue
+                scheduler.report(trial, rung, history[trial][-1][1])
+                print(f'Trial {trial}: rung {rung} validation accuracy {history[trial][-1][1]:.2f}%')
+
+    epochs = sum(len(h) for h in history.values())
+    print(f'Trained {epochs} epochs instead of {len(configs) * scheduler.rungs[-1]} without pruning')
+    return history, scheduler
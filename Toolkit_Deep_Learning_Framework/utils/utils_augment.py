@@ -0,0 +1,149 @@
+'''
+Author: Jason Shi
+Date: 19-10-2026 20:31:16
+Last Editors: Jason
+Contact Last Editors: D23090120503@cityu.edu.mo
+LastEditTime: 19-10-2026 20:31:16
+'''
+
+#! This module is responsible for data augmentation on whole batches (N, C, H, W) after collation, vectorized across
+#! the batch with per-sample randomness. It runs in the loader (AugmentCollate) or on the training device (train()).
+import torch
+import torch.nn.functional as F
+from torch.utils.data import default_collate
+
+AUGMENTATIONS = ['crop', 'flip', 'jitter', 'cutout', 'mixup']
+
+
+class BatchAugment:
+    '''
+    @param:
+    ops(list): augmentations applied in this order, from AUGMENTATIONS
+    padding(int): padding of the random crop
+    flip_p(float): probability of a horizontal flip
+    jitter(float): maximum relative change of brightness, contrast and saturation
+    cutout(int): side of the square erased (set to black) by cutout
+    mixup_alpha(float): Beta(alpha, alpha) distribution of the mixup weight
+    where(str): 'loader' to augment in the loader (collate_fn), 'device' to augment in train() after the transfer
+
+    The batches are uint8 images in [0, 255] or float images normalized with mean/std, set by get_dataset
+    through setup(). Mixup turns the labels into (N, num_classes) probabilities.
+    '''
+
+    def __init__(self, ops=('crop', 'flip'), padding=4, flip_p=0.5, jitter=0.4, cutout=8, mixup_alpha=0.2,
+                 where='loader'):
+        for op in ops:
+            if op not in AUGMENTATIONS:
+                exit('unknown augmentation: %s' % op)
+        self.ops = list(ops)
+        self.padding = padding
+        self.flip_p = flip_p
+        self.jitter = jitter
+        self.cutout = cutout
+        self.mixup_alpha = mixup_alpha
+        self.where = where
+        self.mean = None
+        self.std = None
+        self.num_classes = None
+
+    def setup(self, mean, std, num_classes):
+        self.mean = torch.tensor(mean, dtype=torch.float32).view(1, -1, 1, 1)
+        self.std = torch.tensor(std, dtype=torch.float32).view(1, -1, 1, 1)
+        self.num_classes = num_classes
+
+    def __call__(self, inputs, targets, *extras):
+        if inputs.dtype == torch.uint8:
+            x = inputs.float() / 255.
+        elif 'jitter' in self.ops and self.mean is not None:
+            # the color jitter works on [0, 1] images
+            x = inputs * self.std.to(inputs.device) + self.mean.to(inputs.device)
+        else:
+            x = inputs
+        # black in the space of x: 0 in [0, 1] images, -mean / std in normalized ones
+        normalized = x is inputs and inputs.is_floating_point() and self.mean is not None
+        black = (-self.mean / self.std).to(x.device, x.dtype) if normalized else 0.
+
+        for op in self.ops:
+            if op == 'crop':
+                x = self._crop(x)
+            elif op == 'flip':
+                x = self._flip(x)
+            elif op == 'jitter':
+                x = self._jitter(x)
+            elif op == 'cutout':
+                x = self._cutout(x, black)
+            elif op == 'mixup':
+                x, targets, extras = self._mixup(x, targets, extras)
+
+        if inputs.dtype == torch.uint8:
+            x = (x * 255.).round().clamp(0, 255).to(torch.uint8)
+        elif 'jitter' in self.ops and self.mean is not None:
+            x = (x - self.mean.to(x.device)) / self.std.to(x.device)
+        return (x, targets, *extras)
+
+    def _crop(self, x):
+        # pad, then gather a randomly shifted H x W window per sample
+        n, _, h, w = x.shape
+        p = self.padding
+        padded = F.pad(x, (p, p, p, p))
+        oy = torch.randint(0, 2 * p + 1, (n, 1), device=x.device)
+        ox = torch.randint(0, 2 * p + 1, (n, 1), device=x.device)
+        rows = (oy + torch.arange(h, device=x.device))[:, :, None]
+        cols = (ox + torch.arange(w, device=x.device))[:, None, :]
+        batch = torch.arange(n, device=x.device)[:, None, None]
+        return padded.permute(0, 2, 3, 1)[batch, rows, cols].permute(0, 3, 1, 2).contiguous()
+
+    def _flip(self, x):
+        flip = torch.rand(x.size(0), device=x.device) < self.flip_p
+        return torch.where(flip[:, None, None, None], x.flip(3), x)
+
+    def _jitter(self, x):
+        n = x.size(0)
+
+        def factor():
+            return 1. + (torch.rand(n, 1, 1, 1, device=x.device) * 2. - 1.) * self.jitter
+
+        x = x * factor()
+        mean = x.mean(dim=(1, 2, 3), keepdim=True)
+        x = (x - mean) * factor() + mean
+        if x.size(1) == 3:
+            gray = (0.299 * x[:, 0:1] + 0.587 * x[:, 1:2] + 0.114 * x[:, 2:3])
+            x = (x - gray) * factor() + gray
+        return x.clamp(0., 1.)
+
+    def _cutout(self, x, black=0.):
+        n, _, h, w = x.shape
+        cy = torch.randint(0, h, (n, 1, 1, 1), device=x.device)
+        cx = torch.randint(0, w, (n, 1, 1, 1), device=x.device)
+        ys = torch.arange(h, device=x.device).view(1, 1, h, 1)
+        xs = torch.arange(w, device=x.device).view(1, 1, 1, w)
+        half = self.cutout // 2
+        mask = ((ys - cy).abs() <= half) & ((xs - cx).abs() <= half)
+        return torch.where(mask, black, x)
+
+    def _mixup(self, x, targets, extras):
+        n = x.size(0)
+        lam = torch.distributions.Beta(self.mixup_alpha, self.mixup_alpha).sample((n,)).to(x.device)
+        perm = torch.randperm(n, device=x.device)
+        if targets.dim() == 1:
+            targets = F.one_hot(targets, self.num_classes).float()
+
+        def mix(t):
+            weight = lam.view(-1, *([1] * (t.dim() - 1)))
+            return weight * t + (1. - weight) * t[perm]
+
+        # per-sample float extras (e.g. teacher logits) are mixed with the images
+        extras = tuple(mix(e) if torch.is_tensor(e) and e.is_floating_point() else e for e in extras)
+        return mix(x), mix(targets), extras
+
+
+class AugmentCollate:
+    '''
+    collate_fn applying a BatchAugment to each collated batch, in the loader workers
+    '''
+
+    def __init__(self, augment):
+        self.augment = augment
+
+    def __call__(self, samples):
+        return self.augment(*default_collate(samples))
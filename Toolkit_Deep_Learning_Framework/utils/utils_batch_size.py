@@ -0,0 +1,123 @@
+'''
+Author: Jason Shi
+Date: 19-10-2026 18:05:37
+Last Editors: Jason
+Contact Last Editors: D23090120503@cityu.edu.mo
+LastEditTime: 19-10-2026 18:05:37
+'''
+
+#! This module is responsible for finding the largest safe and the fastest training batch size of a model.
+import os
+import torch
+from utils.utils_networks import get_network, measure_train_step, select_norm_backend
+
+
+def _memory_budget(device):
+    # 90% of the device memory on cuda, 50% of the free RAM on CPU
+    if torch.device(device).type == 'cuda':
+        return int(0.9 * torch.cuda.get_device_properties(device).total_memory)
+    return int(0.5 * os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE'))
+
+
+def _probe(net, channel, im_size, batch_size, device, repeats):
+    '''
+    @return:
+    memory(int): bytes used by a training step (None if it ran out of memory)
+    samples_per_s(float): training throughput
+    '''
+    # parameters, gradients and the two Adam moments stay allocated during the step
+    static = 4 * sum(p.numel() * p.element_size() for p in net.parameters())
+    try:
+        inputs = torch.randn(batch_size, channel, *im_size, device=device)
+        memory, step_time = measure_train_step(net, inputs, repeats)
+    except (RuntimeError, MemoryError) as e:
+        if 'out of memory' not in str(e).lower() and not isinstance(e, MemoryError):
+            raise
+        if torch.device(device).type == 'cuda':
+            torch.cuda.empty_cache()
+        return None, 0.
+    finally:
+        net.zero_grad(set_to_none=True)
+    if torch.device(device).type != 'cuda':
+        memory += static + inputs.numel() * inputs.element_size()
+    return memory, batch_size / step_time
+
+
+def find_batch_size(name, channel, im_size, num_classes, device='cpu', memory_budget=None, start=8,
+                    max_batch_size=4096, refine=True, repeats=2, base_lr=None, base_batch_size=128,
+                    norm_backend='groupnorm'):
+    '''
+    @Description: Probe increasing batch sizes (doubling, then a binary search between the last size that fits and the
+    first one that does not) with a forward/backward step, and measure memory and samples/sec of each.
+
+    @param:
+    name(str): the name of the network
+    channel(int): image channel
+    im_size(tuple): the size of the input image
+    num_classes(int): the number of classes
+    device(str): CPU or GPU(cuda)
+    memory_budget(int): bytes a training step may use (default: 90% of the GPU memory, 50% of the free RAM on CPU)
+    start(int): first batch size probed
+    max_batch_size(int): largest batch size probed
+    refine(bool): binary search the largest safe size above the last power of two
+    repeats(int): timed steps per batch size
+    base_lr(float): learning rate tuned for base_batch_size, to suggest a linearly scaled learning rate
+    base_batch_size(int): batch size base_lr was tuned for
+    norm_backend(str): instance norm kernel of the network, 'auto' is selected once at the start batch size
+
+    @return:
+    result(dict): max_batch_size (largest size within budget), best_batch_size (highest samples/sec),
+    probes ({batch size: (memory, samples/sec)}) and, if base_lr is given, max_lr and best_lr
+    '''
+    memory_budget = memory_budget or _memory_budget(device)
+    net = get_network(name, channel=channel, num_classes=num_classes,
+                      input_size=im_size, dist=False, norm_backend=norm_backend).to(device).train()
+    if norm_backend == 'auto':
+        select_norm_backend(net, (start, channel, *im_size), device=device)
+    probes = {}
+
+    def fits(batch_size):
+        memory, samples_per_s = _probe(
+            net, channel, im_size, batch_size, device, repeats)
+        ok = memory is not None and memory <= memory_budget
+        if memory is not None:
+            probes[batch_size] = (memory, samples_per_s)
+        print(f'batch {batch_size:>5} | ' + (f'memory {memory / 2**20:9.1f}MB | {samples_per_s:9.1f} samples/s'
+                                             if memory is not None else 'out of memory') +
+              ('' if ok else ' | over budget'))
+        return ok
+
+    good, bad = 0, None
+    batch_size = start
+    while batch_size <= max_batch_size:
+        if not fits(batch_size):
+            bad = batch_size
+            break
+        good = batch_size
+        batch_size *= 2
+    if refine and bad is not None and good > 0:
+        while bad - good > max(1, good // 8):
+            middle = (good + bad) // 2
+            if fits(middle):
+                good = middle
+            else:
+                bad = middle
+
+    if good == 0:
+        exit('no batch size from %d fits the memory budget of %.1fMB' % (start, memory_budget / 2**20))
+
+    fitting = {b: p for b, p in probes.items() if p[0] <= memory_budget}
+    result = {
+        'max_batch_size': good,
+        'best_batch_size': max(fitting, key=lambda b: fitting[b][1]),
+        'memory_budget': memory_budget,
+        'probes': probes,
+    }
+    if base_lr is not None:
+        # linear scaling rule: the learning rate grows with the batch size
+        result['max_lr'] = base_lr * result['max_batch_size'] / base_batch_size
+        result['best_lr'] = base_lr * result['best_batch_size'] / base_batch_size
+    print(f"Largest safe batch size: {result['max_batch_size']}, "
+          f"throughput-optimal batch size: {result['best_batch_size']}" +
+          (f" (suggested lr {result['best_lr']:.2e})" if base_lr is not None else ''))
+    return result
@@ -0,0 +1,130 @@
+'''
+Author: Jason Shi
+Date: 19-10-2026 13:20:36
+Last Editors: Jason
+Contact Last Editors: D23090120503@cityu.edu.mo
+LastEditTime: 19-10-2026 13:20:36
+'''
+
+#! This module is responsible for saving and memory-mapping checkpoints in the safetensors layout.
+# File layout: 8-byte little-endian header size | JSON header (padded with spaces) | raw tensor bytes.
+# The header maps each tensor to its dtype, shape and [begin, end) byte range in the data section and
+# stores the get_network arguments under '__metadata__', so a model can be rebuilt from the file alone.
+import json
+import os
+import struct
+import torch
+import torch.nn as nn
+from utils.utils_networks import get_network
+
+_DTYPES = {
+    torch.float64: 'F64', torch.float32: 'F32', torch.float16: 'F16', torch.bfloat16: 'BF16',
+    torch.int64: 'I64', torch.int32: 'I32', torch.int16: 'I16', torch.int8: 'I8', torch.uint8: 'U8',
+    torch.bool: 'BOOL',
+}
+_DTYPE_NAMES = {v: k for k, v in _DTYPES.items()}
+_ALIGN = 64
+
+
+def save_checkpoint(model, path, name, channel, num_classes, input_size=(32, 32), dtype=None):
+    '''
+    @param:
+    model(nn.Module): the network (nn.DataParallel is unwrapped)
+    path(str): output file (.safetensors)
+    name(str): get_network name of the model
+    channel(int): image channel
+    num_classes(int): the number of classes
+    input_size(tuple): the size of the input image
+    dtype(torch.dtype): store floating point weights as this dtype (e.g. torch.float16 or torch.bfloat16)
+    '''
+    if isinstance(model, nn.DataParallel):
+        model = model.module
+    state_dict = {}
+    for key, tensor in model.state_dict().items():
+        tensor = tensor.detach().cpu()
+        if dtype is not None and tensor.is_floating_point():
+            tensor = tensor.to(dtype)
+        state_dict[key] = tensor.contiguous()
+
+    # largest items first: with an aligned data section every tensor starts aligned to its item size
+    keys = sorted(state_dict, key=lambda k: -state_dict[k].element_size())
+    header = {'__metadata__': {
+        'network': name, 'channel': str(channel), 'num_classes': str(num_classes),
+        'input_size': json.dumps(list(input_size)),
+        'dtype': str(dtype or next(model.parameters()).dtype).replace('torch.', ''),
+    }}
+    offset = 0
+    for key in keys:
+        nbytes = state_dict[key].numel() * state_dict[key].element_size()
+        header[key] = {'dtype': _DTYPES[state_dict[key].dtype], 'shape': list(state_dict[key].shape),
+                       'data_offsets': [offset, offset + nbytes]}
+        offset += nbytes
+
+    header = json.dumps(header, separators=(',', ':')).encode('utf-8')
+    header += b' ' * (-(8 + len(header)) % _ALIGN)
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        for key in keys:
+            if state_dict[key].numel() > 0:
+                f.write(state_dict[key].view(-1).view(torch.uint8).numpy().tobytes())
+
+
+def load_checkpoint(path, mmap=True):
+    '''
+    @param:
+    path(str): file written by save_checkpoint
+    mmap(bool): map the file instead of reading it, the tensors are then views of the page cache (copy-on-write)
+
+    @return:
+    state_dict(dict): the tensors
+    metadata(dict): network, channel, num_classes, input_size and dtype
+    '''
+    with open(path, 'rb') as f:
+        header_size = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(header_size))
+        if not mmap:
+            buffer = torch.frombuffer(bytearray(f.read()), dtype=torch.uint8)
+    if mmap:
+        size = os.path.getsize(path)
+        storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=size)
+        buffer = torch.empty(0, dtype=torch.uint8).set_(storage)[8 + header_size:]
+
+    metadata = header.pop('__metadata__', {})
+    metadata = {
+        'network': metadata['network'], 'channel': int(metadata['channel']),
+        'num_classes': int(metadata['num_classes']), 'input_size': tuple(json.loads(metadata['input_size'])),
+        'dtype': getattr(torch, metadata['dtype']),
+    }
+    state_dict = {}
+    for key, info in header.items():
+        begin, end = info['data_offsets']
+        state_dict[key] = buffer[begin:end].view(_DTYPE_NAMES[info['dtype']]).view(info['shape'])
+    return state_dict, metadata
+
+
+def load_network(path, device='cpu', dtype=None, mmap=True):
+    '''
+    @Description: Rebuild the network stored in a checkpoint in one call. On CPU and without dtype conversion the
+    parameters are the memory-mapped tensors themselves, so processes loading the same file share its pages.
+
+    @param:
+    path(str): file written by save_checkpoint
+    device(str): CPU or GPU(cuda)
+    dtype(torch.dtype): convert floating point weights to this dtype (default: keep the stored dtype)
+    mmap(bool): memory-map the file
+
+    @return:
+    model(nn.Module): the network in eval mode
+    metadata(dict): network, channel, num_classes, input_size and dtype
+    '''
+    state_dict, metadata = load_checkpoint(path, mmap=mmap)
+    with torch.device('meta'):
+        model = get_network(metadata['network'], channel=metadata['channel'], num_classes=metadata['num_classes'],
+                            input_size=metadata['input_size'], dist=False)
+    for key, tensor in state_dict.items():
+        if dtype is not None and tensor.is_floating_point():
+            tensor = tensor.to(dtype)
+        state_dict[key] = tensor.to(device)
+    model.load_state_dict(state_dict, assign=True)
+    return model.eval(), metadata
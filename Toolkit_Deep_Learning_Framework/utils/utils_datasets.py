@@ -16,22 +16,80 @@ import os
 import pandas as pd
 import torch
 from torch.utils.data import TensorDataset
+from PIL import Image
+from utils.utils_folder import ThreadedImageFolder, ThreadedFolderLoader
+from utils.utils_augment import AugmentCollate
 
+# channel, im_size and num_classes of each dataset, for tools that do not need to load the data
+DATASET_INFO = {
+    'MNIST': (1, (28, 28), 10),
+    'CIFAR10': (3, (32, 32), 10),
+    'CIFAR100': (3, (32, 32), 100),
+    'Tiny': (3, (64, 64), 200),
+    'SVHN': (3, (32, 32), 10),
+}
 
-def get_dataset(dataset, data_path):
+
+def folder_info(root):
+    '''
+    @Description: Classes and image size of an image folder without scanning every image: the classes are its
+    sorted sub-folders and the size is that of the first image, both in ImageFolder order.
+
+    @param:
+    root(str): <root>/<class>/<image>
+
+    @return:
+    classes(list): the class names
+    im_size(tuple): (height, width) of the first image
+    '''
+    classes = sorted(entry.name for entry in os.scandir(root) if entry.is_dir())
+    for name in classes:
+        for dirpath, _, fnames in sorted(os.walk(os.path.join(root, name), followlinks=True)):
+            for fname in sorted(fnames):
+                if datasets.folder.has_file_allowed_extension(fname, datasets.folder.IMG_EXTENSIONS):
+                    with Image.open(os.path.join(dirpath, fname)) as img:
+                        return classes, (img.height, img.width)
+    exit('unknown dataset: no image in %s' % root)
+
+
+def get_dataset_info(dataset, data_path='./data'):
+    '''
+    @param:
+    dataset(str): a key of DATASET_INFO, or a custom folder dataset <data_path>/<dataset>/train
+    data_path(str): path to the datasets
+
+    @return:
+    channel, im_size, num_classes
+    '''
+    if dataset in DATASET_INFO:
+        return DATASET_INFO[dataset]
+    if os.path.isdir(os.path.join(data_path, dataset, 'train')):
+        classes, im_size = folder_info(os.path.join(data_path, dataset, 'train'))
+        return 3, im_size, len(classes)
+    exit('unknown dataset: %s' % dataset)
+
+
+def get_dataset(dataset, data_path, batch_size=128, num_workers=2, decode_threads=None, augment=None, train=True):
     '''
     @Description: This module is responsible for loading and preprocessing different datasets, including MNIST, CIFAR-10, CIFAR-100, Tiny-imagenet and SVHN.
 
     @param:
-    name(str): The name of the dataset, including 'MNIST', 'CIFAR-10', 'CIFAR-100', 'Tiny-imagenet' and 'SVHN'.
+    name(str): The name of the dataset, including 'MNIST', 'CIFAR-10', 'CIFAR-100', 'Tiny-imagenet' and 'SVHN', or the name of a folder <data_path>/<name> containing train/ and test/ (or val/) image folders.
     batch_size(int): The batch size of the dataset.
     num_workers(int): The number of workers for data loading (Number of sub-processes used to load data)
+    decode_threads(int): The number of threads decoding the images of folder datasets (Tiny and custom folders) in each process, default the number of cores divided by num_workers
+    augment(BatchAugment): Batch augmentation of the training set, set up with the dataset normalization and applied in the training loader if augment.where == 'loader'
+    train(bool): Also load the training set, False to only load the test set (the training loader is then None)
 
     @return:
     train_loader, test_loader: The training and testing data loaders.
 
     '''
 
+    # every worker process has its own decode pool, together they use the cores once
+    if decode_threads is None:
+        decode_threads = max(1, (os.cpu_count() or 1) // max(1, num_workers))
+
     transform = transforms.Compose([
         transforms.ToTensor(),
         # Data preprocessing
@@ -48,10 +106,10 @@ def get_dataset(dataset, data_path):
         transform = transforms.Compose(
             [transforms.ToTensor(), transforms.Normalize(mean=mean, std=std)])
         dst_train = datasets.CIFAR10(
-            data_path, train=True, download=True, transform=transform)
+            data_path, train=True, download=True, transform=transform) if train else None
         dst_test = datasets.CIFAR10(
             data_path, train=False, download=True, transform=transform)
-        class_names = dst_train.classes
+        class_names = dst_test.classes
 
     elif dataset.startswith('CIFAR100'):
         channel = 3
@@ -62,10 +120,10 @@ def get_dataset(dataset, data_path):
         transform = transforms.Compose(
             [transforms.ToTensor(), transforms.Normalize(mean=mean, std=std)])
         dst_train = datasets.CIFAR100(
-            data_path, train=True, download=True, transform=transform)
+            data_path, train=True, download=True, transform=transform) if train else None
         dst_test = datasets.CIFAR100(
             data_path, train=False, download=True, transform=transform)
-        class_names = dst_train.classes
+        class_names = dst_test.classes
 
     elif dataset == 'MNIST':
         channel = 1
@@ -76,10 +134,10 @@ def get_dataset(dataset, data_path):
         transform = transforms.Compose(
             [transforms.ToTensor(), transforms.Normalize(mean=mean, std=std)])
         dst_train = datasets.MNIST(
-            data_path, train=True, download=True, transform=transform)
+            data_path, train=True, download=True, transform=transform) if train else None
         dst_test = datasets.MNIST(
             data_path, train=False, download=True, transform=transform)
-        class_names = dst_train.classes
+        class_names = dst_test.classes
 
     elif dataset == 'Tiny':
         if not os.path.exists(os.path.join(data_path, "tiny-imagenet-200")):
@@ -102,25 +160,25 @@ def get_dataset(dataset, data_path):
         std = (0.2770, 0.2691, 0.2821)
         transform = transforms.Compose(
             [transforms.ToTensor(), transforms.Normalize(mean=mean, std=std)])
-        dst_train = datasets.ImageFolder(root=os.path.join(
-            data_path, 'tiny-imagenet-200/train'), transform=transform)
-        dst_test = datasets.ImageFolder(root=os.path.join(
-            data_path, 'tiny-imagenet-200/val'), transform=transform)
+        dst_train = ThreadedImageFolder(root=os.path.join(
+            data_path, 'tiny-imagenet-200/train'), transform=transform, threads=decode_threads) if train else None
+        class_names = folder_info(os.path.join(data_path, 'tiny-imagenet-200/train'))[0]
+        dst_test = ThreadedImageFolder(root=os.path.join(
+            data_path, 'tiny-imagenet-200/val'), transform=transform, threads=decode_threads)
 
-        images_all = []
-        for i in range(len(dst_test)):
-            images_all.append(torch.unsqueeze(dst_test[i][0], dim=0))
-        images_all = torch.cat(images_all, dim=0).to("cpu")
+        # decode the whole validation set at once on the thread pool
+        images_all = torch.stack([image for image, _ in dst_test.__getitems__(
+            range(len(dst_test)))]).to("cpu")
 
         df = pd.read_csv(os.path.join(data_path, 'tiny-imagenet-200',
                          'val', 'val_annotations.txt'), sep='\t', header=None)
         img_names = [x[0].split('/')[-1] for x in dst_test.samples]
         labels_all = [df[df[0] == x][1].values[0] for x in img_names]
-        labels_all = [dst_train.class_to_idx[x] for x in labels_all]
+        class_to_idx = {name: i for i, name in enumerate(class_names)}
+        labels_all = [class_to_idx[x] for x in labels_all]
         labels_all = torch.tensor(labels_all, dtype=torch.long)
 
         dst_test = TensorDataset(images_all, labels_all)
-        class_names = dst_train.classes
 
     elif dataset == 'SVHN':
         channel = 3
@@ -131,17 +189,51 @@ def get_dataset(dataset, data_path):
         transform = transforms.Compose(
             [transforms.ToTensor(), transforms.Normalize(mean=mean, std=std)])
         dst_train = datasets.SVHN(
-            data_path, split='train', download=True, transform=transform)
+            data_path, split='train', download=True, transform=transform) if train else None
         dst_test = datasets.SVHN(
             data_path, split='test', download=True, transform=transform)
 
+    elif os.path.isdir(os.path.join(data_path, dataset, 'train')):
+        # custom folder dataset: <data_path>/<dataset>/{train,test or val}/<class>/<image>, resized to the size of
+        # the first training image
+        root = os.path.join(data_path, dataset)
+        class_names, im_size = folder_info(os.path.join(root, 'train'))
+        channel = 3
+        num_classes = len(class_names)
+        mean = (0.5, 0.5, 0.5)
+        std = (0.5, 0.5, 0.5)
+        transform = transforms.Compose([transforms.Resize(im_size), transforms.ToTensor(),
+                                        transforms.Normalize(mean=mean, std=std)])
+        dst_train = ThreadedImageFolder(root=os.path.join(root, 'train'), transform=transform,
+                                        threads=decode_threads, draft_size=im_size[::-1]) if train else None
+        # the test labels follow the training classes, even if the test split lacks some of them
+        dst_test = ThreadedImageFolder(root=os.path.join(root, 'test' if os.path.isdir(os.path.join(root, 'test')) else 'val'),
+                                       transform=transform, threads=decode_threads, draft_size=im_size[::-1],
+                                       classes=class_names)
+
     else:
         exit('unknown dataset: %s' % dataset)
 
-    testloader = torch.utils.data.DataLoader(
-        dst_test, batch_size=256, shuffle=False, num_workers=2)
+    # the training batches are augmented as a whole after collation
+    collate_fn = None
+    if augment is not None:
+        augment.setup(mean, std, num_classes)
+        if augment.where == 'loader':
+            collate_fn = AugmentCollate(augment)
 
-    trainloader = torch.utils.data.DataLoader(
-        dst_train, batch_size=128, shuffle=True, num_workers=2)
+    # without worker processes, folder datasets are decoded ahead on their thread pool
+    if isinstance(dst_test, ThreadedImageFolder) and num_workers == 0:
+        testloader = ThreadedFolderLoader(dst_test, batch_size=256, shuffle=False)
+    else:
+        testloader = torch.utils.data.DataLoader(
+            dst_test, batch_size=256, shuffle=False, num_workers=num_workers)
+
+    if dst_train is None:
+        trainloader = None
+    elif isinstance(dst_train, ThreadedImageFolder) and num_workers == 0:
+        trainloader = ThreadedFolderLoader(dst_train, batch_size=batch_size, shuffle=True, collate_fn=collate_fn)
+    else:
+        trainloader = torch.utils.data.DataLoader(
+            dst_train, batch_size=batch_size, shuffle=True, num_workers=num_workers, collate_fn=collate_fn)
 
     return trainloader, testloader, channel, im_size, num_classes
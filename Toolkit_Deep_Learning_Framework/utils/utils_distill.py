@@ -0,0 +1,133 @@
+'''
+Author: Jason Shi
+Date: 19-10-2026 11:05:42
+Last Editors: Jason
+Contact Last Editors: D23090120503@cityu.edu.mo
+LastEditTime: 19-10-2026 11:05:42
+'''
+
+#! This module is responsible for knowledge distillation: caching the teacher logits and the distillation loss.
+import hashlib
+import os
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+from torch.utils.data import DataLoader, Dataset
+from tqdm import tqdm
+
+
+class KDLoss(nn.Module):
+    '''
+    Hinton distillation loss: alpha * T^2 * KL(teacher || student) + (1 - alpha) * cross entropy, where the teacher and
+    student distributions are both softened at temperature T
+    '''
+
+    def __init__(self, temperature=4.0, alpha=0.9):
+        super(KDLoss, self).__init__()
+        self.temperature = temperature
+        self.alpha = alpha
+
+    def forward(self, outputs, targets, teacher_logits=None):
+        ce = F.cross_entropy(outputs, targets)
+        if teacher_logits is None:
+            return ce
+        T = self.temperature
+        kd = F.kl_div(F.log_softmax(outputs / T, dim=1), F.softmax(teacher_logits / T, dim=1),
+                      reduction='batchmean') * T * T
+        return self.alpha * kd + (1. - self.alpha) * ce
+
+
+class TeacherLogitsDataset(Dataset):
+    '''
+    Wrap a dataset so that each sample also returns the cached teacher logits: (image, label, logits)
+    '''
+
+    def __init__(self, dataset, logits):
+        self.dataset = dataset
+        self.logits = logits
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getitem__(self, index):
+        image, label = self.dataset[index]
+        return image, label, self.logits[index]
+
+    def __getitems__(self, indices):
+        # keep the batched (threaded) decode of folder datasets
+        if hasattr(self.dataset, '__getitems__'):
+            samples = self.dataset.__getitems__(indices)
+        else:
+            samples = [self.dataset[index] for index in indices]
+        return [(image, label, self.logits[index]) for (image, label), index in zip(samples, indices)]
+
+
+def compute_teacher_logits(teacher, dataset, device, batch_size=256, num_workers=2):
+    '''
+    @param:
+    teacher(nn.Module): trained teacher network
+    dataset(Dataset): training dataset, iterated in order
+    device: CPU or GPU(cuda)
+    batch_size(int): batch size of the teacher forward pass
+    num_workers(int): the number of workers for data loading
+
+    @return:
+    logits(Tensor): teacher logits of every sample, in dataset order
+    '''
+    loader = DataLoader(dataset, batch_size=batch_size,
+                        shuffle=False, num_workers=num_workers)
+    teacher.eval()
+    logits = []
+    with torch.no_grad():
+        for inputs, _ in tqdm(loader, desc='Teacher logits'):
+            logits.append(teacher(inputs.to(device)).float().cpu())
+    return torch.cat(logits, dim=0)
+
+
+def file_hash(path):
+    '''
+    @param:
+    path(str): any file
+
+    @return:
+    key(str): sha1 of the file content
+    '''
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+def get_teacher_logits(teacher, checkpoint, dataset, device, cache_path, data_key, batch_size=256, num_workers=2):
+    '''
+    @Description: Load the teacher logits from cache_path, or compute and cache them if the file is missing or was
+    produced by another checkpoint or for other training data.
+
+    @param:
+    teacher(nn.Module): trained teacher network
+    checkpoint(str): path of the teacher state_dict, its hash identifies the cache
+    dataset(Dataset): training dataset, iterated in order
+    device: CPU or GPU(cuda)
+    cache_path(str): file of the cached logits
+    data_key(str): identifies the training data (e.g. dataset name and split, or the hash of a tensor file)
+    batch_size(int): batch size of the teacher forward pass
+    num_workers(int): the number of workers for data loading
+
+    @return:
+    logits(Tensor): teacher logits of every sample, in dataset order
+    '''
+    key = file_hash(checkpoint)
+
+    if os.path.exists(cache_path):
+        cache = torch.load(cache_path)
+        if cache['checkpoint'] == key and cache.get('data') == data_key and len(cache['logits']) == len(dataset):
+            print(f'Loaded teacher logits from {cache_path}')
+            return cache['logits']
+
+    logits = compute_teacher_logits(
+        teacher, dataset, device, batch_size=batch_size, num_workers=num_workers)
+    os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+    torch.save({'checkpoint': key, 'data': data_key, 'logits': logits}, cache_path)
+    print(f'Saved teacher logits to {cache_path}')
+    return logits
@@ -3,15 +3,78 @@ Author: Jason Shi
 Date: 02-11-2024 13:14:41
 Last Editors: Jason
 Contact Last Editors: D23090120503@cityu.edu.mo
-LastEditTime: 04-11-2024 01:09:26
+LastEditTime: 19-10-2026 17:02:13
 '''
-#! This module is responsible for the evaluation process of the model and records the relevant information using wandb.
+#! This module is responsible for the evaluation process of the model and records the relevant information through utils_metrics.
+import hashlib
+import os
 import torch
-import wandb
+import torch.nn.functional as F
+from utils import utils_metrics
 from tqdm import tqdm
+from utils.utils_timing import StepTimer
 
 
-def evaluate(model, device, test_loader, criterion, epoch, total_epochs, phase='Test'):
+def model_hash(model):
+    '''
+    @return:
+    digest(str): sha1 of the parameters and buffers, identifies the checkpoint in the evaluation cache
+    '''
+    if isinstance(model, torch.nn.DataParallel):
+        model = model.module
+    sha1 = hashlib.sha1()
+    for key, tensor in model.state_dict().items():
+        sha1.update(key.encode('utf-8'))
+        sha1.update(str(tensor.dtype).encode('utf-8'))
+        sha1.update(tensor.detach().cpu().contiguous().view(-1).view(torch.uint8).numpy().tobytes())
+    return sha1.hexdigest()
+
+
+def eval_cache_path(model, cache_dir, split):
+    return os.path.join(cache_dir, f'{model_hash(model)}_{split}.pt')
+
+
+def compute_metrics(logits, targets, topk=(1, 5), n_bins=15):
+    '''
+    @Description: Metrics computed at once from the logits of the whole split.
+
+    @param:
+    logits(Tensor): (N, num_classes) logits
+    targets(Tensor): (N,) labels
+    topk(tuple): k of the top-k accuracies
+    n_bins(int): confidence bins of the expected calibration error
+
+    @return:
+    metrics(dict): loss, top<k> accuracies (%), per_class_accuracy (%), confusion matrix (rows: true class) and ece
+    '''
+    logits, targets = logits.float(), targets.long()
+    num_classes = logits.size(1)
+    metrics = {'loss': F.cross_entropy(logits, targets).item()}
+
+    ranked = logits.topk(min(max(topk), num_classes), dim=1).indices
+    hits = ranked.eq(targets[:, None])
+    for k in topk:
+        metrics[f'top{k}'] = 100. * hits[:, :k].any(dim=1).float().mean().item()
+
+    predicted = ranked[:, 0]
+    confusion = torch.bincount(targets * num_classes + predicted,
+                               minlength=num_classes ** 2).view(num_classes, num_classes)
+    metrics['confusion'] = confusion
+    metrics['per_class_accuracy'] = 100. * confusion.diag() / confusion.sum(dim=1).clamp(min=1)
+
+    # expected calibration error: |accuracy - confidence| of each confidence bin, weighted by the bin size
+    confidence = logits.softmax(dim=1).max(dim=1).values
+    correct = predicted.eq(targets).float()
+    bins = (confidence * n_bins).long().clamp(max=n_bins - 1)
+    count = torch.bincount(bins, minlength=n_bins).float()
+    bin_confidence = torch.bincount(bins, weights=confidence, minlength=n_bins)
+    bin_correct = torch.bincount(bins, weights=correct, minlength=n_bins)
+    metrics['ece'] = ((bin_correct - bin_confidence).abs().sum() / len(targets)).item()
+    return metrics
+
+
+def evaluate(model, device, test_loader, criterion, epoch, total_epochs, phase='Test', timer=None,
+             cache_dir=None, split='test', extended=False, topk=(1, 5)):
     '''
     @param:
     model: Neural network models
@@ -21,10 +84,17 @@ def evaluate(model, device, test_loader, criterion, epoch, total_epochs, phase='
     epoch(int): Current epoch
     total_epochs(int): Total epochs
     phase(str): Test or Validation
+    timer(StepTimer): records the time of each phase of the steps (optional)
+    cache_dir(str): save the logits in this folder, keyed by the model hash and split, and reuse them instead of
+    running the model again (optional)
+    split(str): name of the evaluated data in the cache key (e.g. 'CIFAR10-test')
+    extended(bool): also compute top-k, per-class accuracy, confusion matrix and calibration error
+    topk(tuple): k of the top-k accuracies
 
     @return:
     avg_loss(float): Average loss
     accuracy(float): Accuracy
+    metrics(dict): compute_metrics of the logits, only returned if extended
 
     '''
     # Initialize model
@@ -32,27 +102,53 @@ def evaluate(model, device, test_loader, criterion, epoch, total_epochs, phase='
     running_loss = 0.0
     correct = 0
     total = 0
+    timer = timer if timer is not None else StepTimer(enabled=False)
+    cache_path = eval_cache_path(model, cache_dir, split) if cache_dir is not None else None
+    keep_logits = cache_path is not None or extended
 
-    
-    with torch.no_grad():
-        progress_bar = tqdm(enumerate(test_loader), total=len(
-            test_loader), desc=f"{phase} [{epoch}/{total_epochs}]")
-        for batch_idx, (inputs, targets) in progress_bar:
-            inputs, targets = inputs.to(device), targets.to(device)
-            outputs = model(inputs)
-            loss = criterion(outputs, targets)
+    if cache_path is not None and os.path.exists(cache_path):
+        cached = torch.load(cache_path)
+        all_logits, all_targets = cached['logits'], cached['targets']
+        with torch.no_grad():
+            avg_loss = criterion(all_logits, all_targets).item()
+        accuracy = 100. * all_logits.argmax(dim=1).eq(all_targets).float().mean().item()
+        print(f'{phase}: loaded logits from {cache_path}')
+    else:
+        all_logits, all_targets = [], []
+        with torch.no_grad():
+            progress_bar = tqdm(enumerate(test_loader), total=len(
+                test_loader), desc=f"{phase} [{epoch}/{total_epochs}]")
+            timer.reset_clock()
+            for batch_idx, (inputs, targets) in progress_bar:
+                timer.start_step()
+                with timer.phase('h2d'):
+                    inputs, targets = inputs.to(device), targets.to(device)
+                with timer.phase('forward'):
+                    outputs = model(inputs)
+                    loss = criterion(outputs, targets)
 
-            running_loss += loss.item() * inputs.size(0)
-            _, predicted = outputs.max(1)
-            total += targets.size(0)
-            correct += predicted.eq(targets).sum().item()
+                with timer.phase('logging'):
+                    running_loss += loss.item() * inputs.size(0)
+                    _, predicted = outputs.max(1)
+                    total += targets.size(0)
+                    correct += predicted.eq(targets).sum().item()
+                    if keep_logits:
+                        all_logits.append(outputs.float().cpu())
+                        all_targets.append(targets.cpu())
 
-            progress_bar.set_postfix(loss=loss.item(), acc=100.*correct/total)
+                    progress_bar.set_postfix(loss=loss.item(), acc=100.*correct/total)
+                timer.end_step()
+            timer.finish_profile()
 
-    avg_loss = running_loss / total
-    accuracy = 100. * correct / total
+        avg_loss = running_loss / total
+        accuracy = 100. * correct / total
+        if keep_logits:
+            all_logits, all_targets = torch.cat(all_logits), torch.cat(all_targets)
+        if cache_path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            torch.save({'logits': all_logits, 'targets': all_targets}, cache_path)
 
-    wandb.log({
+    utils_metrics.log({
         f'{phase} Loss': avg_loss,
         f'{phase} Accuracy': accuracy,
         'Epoch': epoch
@@ -60,4 +156,15 @@ def evaluate(model, device, test_loader, criterion, epoch, total_epochs, phase='
 
     print(f'{phase} Loss: {avg_loss:.4f}, {phase} Accuracy: {accuracy:.2f}%')
 
-    return avg_loss, accuracy
+    if not extended:
+        return avg_loss, accuracy
+
+    metrics = compute_metrics(all_logits, all_targets, topk=topk)
+    utils_metrics.log({
+        **{f'{phase} Top-{k} Accuracy': metrics[f'top{k}'] for k in topk},
+        f'{phase} ECE': metrics['ece'],
+        'Epoch': epoch
+    })
+    print(', '.join(f'{phase} Top-{k}: {metrics[f"top{k}"]:.2f}%' for k in topk) +
+          f', {phase} ECE: {metrics["ece"]:.4f}')
+    return avg_loss, accuracy, metrics
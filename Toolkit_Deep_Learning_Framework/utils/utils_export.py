@@ -0,0 +1,170 @@
+'''
+Author: Jason Shi
+Date: 19-10-2026 10:12:05
+Last Editors: Jason
+Contact Last Editors: D23090120503@cityu.edu.mo
+LastEditTime: 19-10-2026 10:12:05
+'''
+
+#! This module is responsible for exporting trained models to TorchScript and ONNX and benchmarking the exported runtimes.
+import inspect
+import time
+import torch
+from utils.utils_networks import get_network
+from utils.utils_checkpoint import load_network
+
+
+def load_model(checkpoint, name, channel, num_classes, input_size=(32, 32), device='cpu'):
+    '''
+    @Description: Rebuild a network with get_network and load a checkpoint saved by main.py.
+
+    @param:
+    checkpoint(str): path of the state_dict (e.g. best_model.pth) or of a .safetensors checkpoint
+    name(str): the name of the network
+    channel(int): image channel
+    num_classes(int): the number of classes
+    input_size(tuple): the size of the input image
+    device(str): CPU or GPU(cuda)
+
+    @return:
+    model(nn.Module): the network in eval mode
+    '''
+    if checkpoint.endswith('.safetensors'):
+        # the network is described by the checkpoint metadata
+        model, _ = load_network(checkpoint, device=device, dtype=torch.float32)
+        return model
+    model = get_network(name, channel=channel, num_classes=num_classes,
+                        input_size=input_size, dist=False)
+    state_dict = torch.load(checkpoint, map_location='cpu')
+    # models trained on several GPUs are wrapped in nn.DataParallel
+    state_dict = {k[len('module.'):] if k.startswith('module.') else k: v
+                  for k, v in state_dict.items()}
+    model.load_state_dict(state_dict)
+    return model.to(device).eval()
+
+
+def export_torchscript(model, example, path):
+    '''
+    @param:
+    model(nn.Module): the network in eval mode
+    example(Tensor): example input batch
+    path(str): output file (.pt)
+
+    @return:
+    scripted(ScriptModule): the traced model
+    '''
+    with torch.no_grad():
+        scripted = torch.jit.trace(model, example)
+    scripted.save(path)
+    return scripted
+
+
+def export_onnx(model, example, path, opset_version=17):
+    '''
+    @param:
+    model(nn.Module): the network in eval mode
+    example(Tensor): example input batch
+    path(str): output file (.onnx)
+    opset_version(int): ONNX opset
+
+    @return:
+    path(str): output file, the batch dimension is dynamic
+    '''
+    kwargs = {}
+    if 'dynamo' in inspect.signature(torch.onnx.export).parameters:
+        kwargs['dynamo'] = False
+    with torch.no_grad():
+        torch.onnx.export(model, (example,), path, input_names=['input'], output_names=['output'],
+                          dynamic_axes={'input': {0: 'batch'}, 'output': {0: 'batch'}},
+                          opset_version=opset_version, **kwargs)
+    return path
+
+
+def get_runtimes(model, torchscript_path=None, onnx_path=None):
+    '''
+    @Description: Collect every runtime available locally as a callable mapping an input batch to logits.
+
+    @param:
+    model(nn.Module): the eager network in eval mode
+    torchscript_path(str): exported TorchScript file
+    onnx_path(str): exported ONNX file, only used if onnxruntime is installed
+
+    @return:
+    runtimes(dict): runtime name -> callable
+    '''
+    device = next(model.parameters()).device
+    runtimes = {'eager': model}
+    if torchscript_path is not None:
+        runtimes['torchscript'] = torch.jit.load(torchscript_path, map_location=device).eval()
+    if onnx_path is not None:
+        try:
+            import onnxruntime
+        except ImportError:
+            print('onnxruntime is not installed, skip the ONNX runtime')
+        else:
+            session = onnxruntime.InferenceSession(
+                onnx_path, providers=onnxruntime.get_available_providers())
+
+            def run_onnx(inputs):
+                outputs = session.run(None, {'input': inputs.cpu().numpy()})[0]
+                return torch.from_numpy(outputs)
+
+            runtimes['onnxruntime'] = run_onnx
+    return runtimes
+
+
+def validate_runtimes(runtimes, example, atol=1e-4):
+    '''
+    @param:
+    runtimes(dict): runtime name -> callable, must contain 'eager'
+    example(Tensor): input batch
+    atol(float): tolerated max absolute difference with the eager logits
+
+    @return:
+    errors(dict): max absolute difference of each runtime with eager
+    '''
+    with torch.no_grad():
+        reference = runtimes['eager'](example).cpu()
+        errors = {}
+        for name, runtime in runtimes.items():
+            if name == 'eager':
+                continue
+            errors[name] = (runtime(example).cpu() - reference).abs().max().item()
+            status = 'OK' if errors[name] <= atol else 'MISMATCH'
+            print(f'{name}: max abs diff {errors[name]:.2e} [{status}]')
+    return errors
+
+
+def benchmark_runtimes(runtimes, input_shape, batch_sizes=(1, 8, 32, 128), device='cpu', warmup=3, repeats=20):
+    '''
+    @param:
+    runtimes(dict): runtime name -> callable
+    input_shape(tuple): (channel, height, width)
+    batch_sizes(list): batch sizes to measure
+    device(str): CPU or GPU(cuda)
+    warmup(int): untimed runs
+    repeats(int): timed runs
+
+    @return:
+    results(list): dicts with runtime, batch_size, latency (ms) and throughput (samples/s)
+    '''
+    results = []
+    with torch.no_grad():
+        for batch_size in batch_sizes:
+            inputs = torch.randn(batch_size, *input_shape, device=device)
+            for name, runtime in runtimes.items():
+                for _ in range(warmup):
+                    runtime(inputs)
+                if inputs.is_cuda:
+                    torch.cuda.synchronize()
+                start = time.perf_counter()
+                for _ in range(repeats):
+                    runtime(inputs)
+                if inputs.is_cuda:
+                    torch.cuda.synchronize()
+                latency = (time.perf_counter() - start) / repeats
+                results.append({'runtime': name, 'batch_size': batch_size,
+                                'latency': 1000. * latency, 'throughput': batch_size / latency})
+                print(f'{name:>12} | batch {batch_size:>4} | {1000. * latency:8.2f} ms | '
+                      f'{batch_size / latency:10.1f} samples/s')
+    return results
@@ -0,0 +1,112 @@
+'''
+Author: Jason Shi
+Date: 19-10-2026 19:12:48
+Last Editors: Jason
+Contact Last Editors: D23090120503@cityu.edu.mo
+LastEditTime: 19-10-2026 19:12:48
+'''
+
+#! This module is responsible for decoding image folders (e.g. Tiny-ImageNet) on a thread pool.
+# PIL releases the GIL while it decodes, so threads decode a batch in parallel inside a single process.
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import torch
+from PIL import Image
+from torch.utils.data import default_collate
+from torchvision import datasets
+
+
+class ThreadedImageFolder(datasets.ImageFolder):
+    '''
+    ImageFolder whose batches (__getitems__, used by DataLoader) are decoded and transformed on a thread pool.
+
+    @param:
+    root(str): folder with one sub-folder per class
+    transform: transform applied to each PIL image
+    threads(int): decode threads per process (default: number of cores)
+    draft_size(tuple): let the JPEG decoder produce the smallest scale (1/2, 1/4, 1/8) that is still at least this
+    (width, height), much cheaper than a full decode when the images are resized afterwards
+    classes(list): class names in label order (e.g. those of the training split), sub-folders of other names are
+    ignored and missing ones are allowed (default: the sorted sub-folders)
+    '''
+
+    def __init__(self, root, transform=None, target_transform=None, threads=None, draft_size=None, classes=None):
+        self.fixed_classes = classes
+        super(ThreadedImageFolder, self).__init__(root, transform=transform, target_transform=target_transform,
+                                                  loader=self._load, allow_empty=classes is not None)
+        self.threads = threads or os.cpu_count()
+        self.draft_size = draft_size
+        self._pool = None
+        self._pool_pid = None
+
+    def find_classes(self, directory):
+        if self.fixed_classes is None:
+            return super(ThreadedImageFolder, self).find_classes(directory)
+        return list(self.fixed_classes), {name: i for i, name in enumerate(self.fixed_classes)}
+
+    def _load(self, path):
+        with open(path, 'rb') as f:
+            img = Image.open(f)
+            if self.draft_size is not None:
+                img.draft('RGB', self.draft_size)
+            return img.convert('RGB')
+
+    @property
+    def pool(self):
+        # a thread pool does not survive fork, each DataLoader worker creates its own
+        if self._pool is None or self._pool_pid != os.getpid():
+            self._pool = ThreadPoolExecutor(
+                self.threads, thread_name_prefix='decode')
+            self._pool_pid = os.getpid()
+        return self._pool
+
+    def __getitems__(self, indices):
+        return list(self.pool.map(self.__getitem__, indices))
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_pool'] = None
+        return state
+
+
+class ThreadedFolderLoader:
+    '''
+    Loader for a ThreadedImageFolder without worker processes: the next read_ahead batches are decoded on the
+    dataset thread pool while the current one is used.
+
+    @param:
+    dataset(ThreadedImageFolder): the dataset
+    batch_size(int): the batch size
+    shuffle(bool): reshuffle at every epoch
+    read_ahead(int): maximum number of batches decoded in advance
+    drop_last(bool): drop the last incomplete batch
+    collate_fn: merges the samples of a batch (default: default_collate)
+    '''
+
+    num_workers = 0
+
+    def __init__(self, dataset, batch_size=128, shuffle=False, read_ahead=2, drop_last=False, collate_fn=None):
+        self.dataset = dataset
+        self.collate_fn = collate_fn or default_collate
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.read_ahead = read_ahead
+        self.drop_last = drop_last
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.dataset) // self.batch_size
+        return (len(self.dataset) + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        order = torch.randperm(len(self.dataset)) if self.shuffle else torch.arange(len(self.dataset))
+        batches = iter(order[i * self.batch_size:(i + 1) * self.batch_size].tolist() for i in range(len(self)))
+        pool = self.dataset.pool
+        pending = deque()
+        for indices in batches:
+            pending.append([pool.submit(self.dataset.__getitem__, i) for i in indices])
+            if len(pending) > self.read_ahead:
+                yield self.collate_fn([future.result() for future in pending.popleft()])
+        while pending:
+            yield self.collate_fn([future.result() for future in pending.popleft()])
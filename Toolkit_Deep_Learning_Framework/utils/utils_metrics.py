@@ -0,0 +1,175 @@
+'''
+Author: Jason Shi
+Date: 19-10-2026 16:24:09
+Last Editors: Jason
+Contact Last Editors: D23090120503@cityu.edu.mo
+LastEditTime: 19-10-2026 16:24:09
+'''
+
+#! This module is responsible for recording metrics: a background thread batches the records and writes them to
+#! wandb, a local JSONL/CSV file or nowhere, so that logging never blocks the training loop.
+import csv
+import json
+import queue
+import threading
+import time
+
+
+class NullSink:
+    def write(self, records):
+        pass
+
+    def close(self):
+        pass
+
+
+class WandbSink:
+    def __init__(self):
+        import wandb
+        self.wandb = wandb
+
+    def write(self, records):
+        for record in records:
+            record = dict(record)
+            record.pop('_time', None)
+            self.wandb.log(record)
+
+    def close(self):
+        pass
+
+
+class FileSink:
+    '''
+    Append the records to a .jsonl file (one JSON object per record) or a .csv file (one row per metric:
+    time, key, value)
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self.csv = path.endswith('.csv')
+        self.file = open(path, 'a', newline='' if self.csv else None)
+        if self.csv:
+            self.writer = csv.writer(self.file)
+            if self.file.tell() == 0:
+                self.writer.writerow(['time', 'key', 'value'])
+
+    def write(self, records):
+        for record in records:
+            if self.csv:
+                self.writer.writerows([record['_time'], key, value]
+                                      for key, value in record.items() if key != '_time')
+            else:
+                self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class MetricsLogger:
+    '''
+    Queue the records and write them to the sink from a background thread, in batches of up to batch_size records
+    or every flush_interval seconds. log() never blocks: when the queue is full the record is dropped and counted.
+
+    @param:
+    sink: NullSink, WandbSink or FileSink
+    batch_size(int): maximum number of records written at once
+    flush_interval(float): maximum seconds a record waits in the queue
+    max_queue(int): maximum number of pending records
+    '''
+
+    def __init__(self, sink, batch_size=64, flush_interval=1.0, max_queue=10000):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='metrics', daemon=True)
+        self._thread.start()
+
+    def log(self, metrics):
+        if self._closed:
+            return
+        try:
+            self.queue.put_nowait(dict(metrics, _time=time.time()))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        stop = False
+        while not stop:
+            records = []
+            deadline = time.monotonic() + self.flush_interval
+            while len(records) < self.batch_size:
+                try:
+                    record = self.queue.get(timeout=max(0., deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if record is None:
+                    stop = True
+                    self.queue.task_done()
+                    break
+                records.append(record)
+            if records:
+                try:
+                    self.sink.write(records)
+                except Exception as e:  # a failing sink must not stop the training
+                    print(f'metrics sink error: {e}')
+                for _ in records:
+                    self.queue.task_done()
+
+    def flush(self):
+        # wait until every record logged so far is written
+        self.queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.queue.put(None)
+        self._thread.join()
+        self.sink.close()
+        if self.dropped:
+            print(f'metrics: {self.dropped} record(s) dropped, the queue was full')
+
+
+_logger = None
+
+
+def init_metrics(sink='wandb', path='metrics.jsonl', **kwargs):
+    '''
+    @param:
+    sink(str): 'wandb', 'file' or 'none'
+    path(str): .jsonl or .csv file of the 'file' sink
+    kwargs: batch_size, flush_interval and max_queue of MetricsLogger
+
+    @return:
+    logger(MetricsLogger): the logger used by log()
+    '''
+    global _logger
+    if _logger is not None:
+        _logger.close()
+    if sink == 'wandb':
+        sink = WandbSink()
+    elif sink == 'file':
+        sink = FileSink(path)
+    elif sink == 'none':
+        sink = NullSink()
+    else:
+        exit('unknown metrics sink: %s' % sink)
+    _logger = MetricsLogger(sink, **kwargs)
+    return _logger
+
+
+def log(metrics):
+    # no-op until init_metrics is called
+    if _logger is not None:
+        _logger.log(metrics)
+
+
+def finish():
+    global _logger
+    if _logger is not None:
+        _logger.close()
+        _logger = None
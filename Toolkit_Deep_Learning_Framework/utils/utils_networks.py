@@ -18,6 +18,154 @@ LastEditTime: 03-11-2024 23:21:12
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+from torch.utils.checkpoint import checkpoint
+import time
+
+# Normalization
+
+# 'instancenorm' models can run their instance norm through one of these kernels,
+# all of them share the same parameters (weight, bias) and state-dict keys
+NORM_BACKENDS = ['groupnorm', 'instancenorm', 'fused', 'auto']
+
+
+def _fused_instance_norm(x, weight, bias, eps):
+    # fold the normalization and the affine transform into a single multiply-add
+    var, mean = torch.var_mean(x, dim=(2, 3), keepdim=True, unbiased=False)
+    scale = weight.view(1, -1, 1, 1) * torch.rsqrt(var + eps)
+    return x * scale + (bias.view(1, -1, 1, 1) - mean * scale)
+
+
+_instance_norm_kernels = {
+    'groupnorm': lambda x, weight, bias, eps: F.group_norm(x, weight.numel(), weight, bias, eps),
+    'instancenorm': lambda x, weight, bias, eps: F.instance_norm(x, weight=weight, bias=bias, eps=eps),
+    'fused': _fused_instance_norm,
+}
+
+
+def benchmark_instance_norm(shape, device='cpu', dtype=torch.float32, backward=True, repeats=20):
+    '''
+    @Description: Time every instance norm kernel on one input shape.
+
+    @param:
+    shape(tuple): input shape (N, C, H, W)
+    device(str): CPU or GPU(cuda)
+    dtype(torch.dtype): input dtype
+    backward(bool): whether to time forward + backward or forward only
+    repeats(int): number of timed runs per kernel
+
+    @return:
+    timings(dict): seconds per run of each kernel
+    '''
+    x = torch.randn(shape, device=device, dtype=dtype, requires_grad=backward)
+    weight = torch.ones(shape[1], device=device, dtype=dtype, requires_grad=backward)
+    bias = torch.zeros(shape[1], device=device, dtype=dtype, requires_grad=backward)
+    timings = {}
+    for name, kernel in _instance_norm_kernels.items():
+        with torch.set_grad_enabled(backward):
+            for i in range(repeats + 1):
+                if i == 1:  # the first run is warm-up
+                    if x.is_cuda:
+                        torch.cuda.synchronize()
+                    start = time.perf_counter()
+                out = kernel(x, weight, bias, 1e-5)
+                if backward:
+                    out.sum().backward()
+            if x.is_cuda:
+                torch.cuda.synchronize()
+        timings[name] = (time.perf_counter() - start) / repeats
+    return timings
+
+
+class InstanceNorm(nn.Module):
+    '''
+    Instance norm with affine parameters running one of the instance norm kernels (backend, set per layer),
+    state-dict compatible with nn.GroupNorm(C, C) and nn.InstanceNorm2d(C, affine=True)
+    '''
+
+    def __init__(self, num_channels, eps=1e-5, backend='groupnorm'):
+        super(InstanceNorm, self).__init__()
+        self.num_channels = num_channels
+        self.eps = eps
+        self.backend = backend
+        self.weight = nn.Parameter(torch.ones(num_channels))
+        self.bias = nn.Parameter(torch.zeros(num_channels))
+
+    def forward(self, x):
+        return _instance_norm_kernels[self.backend](x, self.weight, self.bias, self.eps)
+
+    def extra_repr(self):
+        return '{num_channels}, eps={eps}, backend={backend}'.format(**self.__dict__)
+
+
+def set_norm_backend(net, backend):
+    '''
+    @param:
+    net(nn.Module): the network
+    backend(str): kernel of every InstanceNorm layer, one of NORM_BACKENDS except 'auto' (see select_norm_backend)
+    '''
+    if backend not in _instance_norm_kernels:
+        exit('unknown norm backend: %s' % backend)
+    for module in net.modules():
+        if isinstance(module, InstanceNorm):
+            module.backend = backend
+
+
+def select_norm_backend(net, input_shape, device='cpu', backward=True):
+    '''
+    @Description: Give every InstanceNorm layer the fastest kernel for the shape it sees with inputs of input_shape,
+    each distinct shape is benchmarked once. Call it once before training or export, the layers then keep their
+    kernel for any batch size.
+
+    @param:
+    net(nn.Module): the network, on device
+    input_shape(tuple): (batch size, channel, height, width) of the training (or inference) batches
+    device(str): CPU or GPU(cuda)
+    backward(bool): time forward + backward (training) or forward only (inference)
+
+    @return:
+    choices(dict): layer input shape -> kernel
+    '''
+    model = net.module if isinstance(net, nn.DataParallel) else net
+    layers = [module for module in model.modules() if isinstance(module, InstanceNorm)]
+    if not layers:
+        return {}
+
+    # the shape seen by every layer, from one forward pass
+    shapes = {}
+
+    def record(module, args):
+        shapes[module] = tuple(args[0].shape)
+
+    hooks = [layer.register_forward_pre_hook(record) for layer in layers]
+    was_training = model.training
+    with torch.no_grad():
+        model.eval()(torch.zeros(input_shape, device=device, dtype=layers[0].weight.dtype))
+    model.train(was_training)
+    for hook in hooks:
+        hook.remove()
+
+    choices = {}
+    for layer, shape in shapes.items():
+        if shape not in choices:
+            timings = benchmark_instance_norm(shape, device=device, dtype=layer.weight.dtype, backward=backward)
+            choices[shape] = min(timings, key=timings.get)
+        layer.backend = choices[shape]
+    print('Instance norm kernels: ' + ', '.join(f'{shape}: {kernel}' for shape, kernel in choices.items()))
+    return choices
+
+
+def get_norm(norm, num_channels):
+    '''
+    @param:
+    norm(str): 'instancenorm' or 'batchnorm'
+    num_channels(int): the number of channels
+
+    @return:
+    layer(nn.Module): the normalization layer, the instance norm kernel is set by get_network
+    '''
+    if norm != 'instancenorm':
+        return nn.BatchNorm2d(num_channels)
+    return InstanceNorm(num_channels)
 
 # MLP
 
@@ -30,7 +178,7 @@ class MLP(nn.Module):
         self.fc_3 = nn.Linear(128, num_classes)
 
     def forward(self, x):
-        out = x.view(x.size(0), -1)
+        out = x.reshape(x.size(0), -1)
         out = F.relu(self.fc_1(out))
         out = F.relu(self.fc_2(out))
         out = self.fc_3(out)
@@ -64,7 +212,7 @@ class ConvNet(nn.Module):
     def forward(self, x):
         out = self.layer1(x)
         out = self.layer2(out)
-        out = out.view(out.size(0), -1)
+        out = out.reshape(out.size(0), -1)
         out = self.fc(out)
         return out
 
@@ -89,7 +237,7 @@ class LeNet(nn.Module):
 
     def forward(self, x):
         x = self.features(x)
-        x = x.view(x.size(0), -1)
+        x = x.reshape(x.size(0), -1)
         x = F.relu(self.fc_1(x))
         x = F.relu(self.fc_2(x))
         x = self.fc_3(x)
@@ -121,7 +269,7 @@ class AlexNet(nn.Module):
 
     def forward(self, x):
         x = self.features(x)
-        x = x.view(x.size(0), -1)
+        x = x.reshape(x.size(0), -1)
         x = self.fc(x)
         return x
 
@@ -146,7 +294,7 @@ class VGG(nn.Module):
 
     def forward(self, x):
         x = self.features(x)
-        x = x.view(x.size(0), -1)
+        x = x.reshape(x.size(0), -1)
         x = self.classifier(x)
         return x
 
@@ -158,8 +306,7 @@ class VGG(nn.Module):
                 layers += [nn.MaxPool2d(kernel_size=2, stride=2)]
             else:
                 layers += [nn.Conv2d(in_channels, x, kernel_size=3, padding=3 if self.channel == 1 and ic == 0 else 1),
-                           nn.GroupNorm(
-                               x, x, affine=True) if norm == 'instancenorm' else nn.BatchNorm2d(x),
+                           get_norm(norm, x),
                            nn.ReLU(inplace=True)]
                 in_channels = x
         layers += [nn.AvgPool2d(kernel_size=1, stride=1 if res == 32 else 2)]
@@ -203,12 +350,10 @@ class BasicBlock_AP(nn.Module):
         self.stride = stride
         self.conv1 = nn.Conv2d(in_planes, planes, kernel_size=3,
                                stride=1, padding=1, bias=False)  # modification
-        self.bn1 = nn.GroupNorm(
-            planes, planes, affine=True) if self.norm == 'instancenorm' else nn.BatchNorm2d(planes)
+        self.bn1 = get_norm(self.norm, planes)
         self.conv2 = nn.Conv2d(planes, planes, kernel_size=3,
                                stride=1, padding=1, bias=False)
-        self.bn2 = nn.GroupNorm(
-            planes, planes, affine=True) if self.norm == 'instancenorm' else nn.BatchNorm2d(planes)
+        self.bn2 = get_norm(self.norm, planes)
 
         self.shortcut = nn.Sequential()
         if stride != 1 or in_planes != self.expansion * planes:
@@ -216,8 +361,7 @@ class BasicBlock_AP(nn.Module):
                 nn.Conv2d(in_planes, self.expansion * planes,
                           kernel_size=1, stride=1, bias=False),
                 nn.AvgPool2d(kernel_size=2, stride=2),  # modification
-                nn.GroupNorm(self.expansion * planes, self.expansion * planes,
-                             affine=True) if self.norm == 'instancenorm' else nn.BatchNorm2d(self.expansion * planes)
+                get_norm(self.norm, self.expansion * planes)
             )
 
     def forward(self, x):
@@ -238,16 +382,13 @@ class Bottleneck_AP(nn.Module):
         self.norm = norm
         self.stride = stride
         self.conv1 = nn.Conv2d(in_planes, planes, kernel_size=1, bias=False)
-        self.bn1 = nn.GroupNorm(
-            planes, planes, affine=True) if self.norm == 'instancenorm' else nn.BatchNorm2d(planes)
+        self.bn1 = get_norm(self.norm, planes)
         self.conv2 = nn.Conv2d(planes, planes, kernel_size=3,
                                stride=1, padding=1, bias=False)  # modification
-        self.bn2 = nn.GroupNorm(
-            planes, planes, affine=True) if self.norm == 'instancenorm' else nn.BatchNorm2d(planes)
+        self.bn2 = get_norm(self.norm, planes)
         self.conv3 = nn.Conv2d(planes, self.expansion *
                                planes, kernel_size=1, bias=False)
-        self.bn3 = nn.GroupNorm(self.expansion * planes, self.expansion * planes,
-                                affine=True) if self.norm == 'instancenorm' else nn.BatchNorm2d(self.expansion * planes)
+        self.bn3 = get_norm(self.norm, self.expansion * planes)
 
         self.shortcut = nn.Sequential()
         if stride != 1 or in_planes != self.expansion * planes:
@@ -255,8 +396,7 @@ class Bottleneck_AP(nn.Module):
                 nn.Conv2d(in_planes, self.expansion * planes,
                           kernel_size=1, stride=1, bias=False),
                 nn.AvgPool2d(kernel_size=2, stride=2),  # modification
-                nn.GroupNorm(self.expansion * planes, self.expansion * planes,
-                             affine=True) if self.norm == 'instancenorm' else nn.BatchNorm2d(self.expansion * planes)
+                get_norm(self.norm, self.expansion * planes)
             )
 
     def forward(self, x):
@@ -278,8 +418,7 @@ class ResNet_AP(nn.Module):
 
         self.conv1 = nn.Conv2d(channel, 64, kernel_size=3,
                                stride=1, padding=1, bias=False)
-        self.bn1 = nn.GroupNorm(
-            64, 64, affine=True) if self.norm == 'instancenorm' else nn.BatchNorm2d(64)
+        self.bn1 = get_norm(self.norm, 64)
         self.layer1 = self._make_layer(block, 64, num_blocks[0], stride=1)
         self.layer2 = self._make_layer(block, 128, num_blocks[1], stride=2)
         self.layer3 = self._make_layer(block, 256, num_blocks[2], stride=2)
@@ -302,7 +441,7 @@ class ResNet_AP(nn.Module):
         out = self.layer3(out)
         out = self.layer4(out)
         out = F.avg_pool2d(out, kernel_size=1, stride=1)  # modification
-        out = out.view(out.size(0), -1)
+        out = out.reshape(out.size(0), -1)
         out = self.classifier(out)
         return out
 
@@ -323,20 +462,17 @@ class BasicBlock(nn.Module):
         self.norm = norm
         self.conv1 = nn.Conv2d(
             in_planes, planes, kernel_size=3, stride=stride, padding=1, bias=False)
-        self.bn1 = nn.GroupNorm(
-            planes, planes, affine=True) if self.norm == 'instancenorm' else nn.BatchNorm2d(planes)
+        self.bn1 = get_norm(self.norm, planes)
         self.conv2 = nn.Conv2d(planes, planes, kernel_size=3,
                                stride=1, padding=1, bias=False)
-        self.bn2 = nn.GroupNorm(
-            planes, planes, affine=True) if self.norm == 'instancenorm' else nn.BatchNorm2d(planes)
+        self.bn2 = get_norm(self.norm, planes)
 
         self.shortcut = nn.Sequential()
         if stride != 1 or in_planes != self.expansion*planes:
             self.shortcut = nn.Sequential(
                 nn.Conv2d(in_planes, self.expansion*planes,
                           kernel_size=1, stride=stride, bias=False),
-                nn.GroupNorm(self.expansion*planes, self.expansion*planes,
-                             affine=True) if self.norm == 'instancenorm' else nn.BatchNorm2d(self.expansion*planes)
+                get_norm(self.norm, self.expansion*planes)
             )
 
     def forward(self, x):
@@ -354,24 +490,20 @@ class Bottleneck(nn.Module):
         super(Bottleneck, self).__init__()
         self.norm = norm
         self.conv1 = nn.Conv2d(in_planes, planes, kernel_size=1, bias=False)
-        self.bn1 = nn.GroupNorm(
-            planes, planes, affine=True) if self.norm == 'instancenorm' else nn.BatchNorm2d(planes)
+        self.bn1 = get_norm(self.norm, planes)
         self.conv2 = nn.Conv2d(planes, planes, kernel_size=3,
                                stride=stride, padding=1, bias=False)
-        self.bn2 = nn.GroupNorm(
-            planes, planes, affine=True) if self.norm == 'instancenorm' else nn.BatchNorm2d(planes)
+        self.bn2 = get_norm(self.norm, planes)
         self.conv3 = nn.Conv2d(planes, self.expansion *
                                planes, kernel_size=1, bias=False)
-        self.bn3 = nn.GroupNorm(self.expansion*planes, self.expansion*planes,
-                                affine=True) if self.norm == 'instancenorm' else nn.BatchNorm2d(self.expansion*planes)
+        self.bn3 = get_norm(self.norm, self.expansion*planes)
 
         self.shortcut = nn.Sequential()
         if stride != 1 or in_planes != self.expansion*planes:
             self.shortcut = nn.Sequential(
                 nn.Conv2d(in_planes, self.expansion*planes,
                           kernel_size=1, stride=stride, bias=False),
-                nn.GroupNorm(self.expansion*planes, self.expansion*planes,
-                             affine=True) if self.norm == 'instancenorm' else nn.BatchNorm2d(self.expansion*planes)
+                get_norm(self.norm, self.expansion*planes)
             )
 
     def forward(self, x):
@@ -384,18 +516,19 @@ class Bottleneck(nn.Module):
 
 
 class ResNet(nn.Module):
-    def __init__(self, block, num_blocks, channel=3, num_classes=10, norm='instancenorm', res=32):
+    def __init__(self, block, num_blocks, channel=3, num_classes=10, norm='instancenorm', res=32, checkpoint_activations=0):
         super(ResNet, self).__init__()
         self.in_planes = 64
         self.norm = norm
+        # recompute activations every k blocks in backward (0: off, -1: whole stage)
+        self.checkpoint_activations = checkpoint_activations
         if res == 64:
             self.conv1 = nn.Conv2d(
                 channel, 64, kernel_size=3, stride=2, padding=1, bias=False)
         else:
             self.conv1 = nn.Conv2d(
                 channel, 64, kernel_size=3, stride=1, padding=1, bias=False)
-        self.bn1 = nn.GroupNorm(
-            64, 64, affine=True) if self.norm == 'instancenorm' else nn.BatchNorm2d(64)
+        self.bn1 = get_norm(self.norm, 64)
         self.layer1 = self._make_layer(block, 64, num_blocks[0], stride=1)
         self.layer2 = self._make_layer(block, 128, num_blocks[1], stride=2)
         self.layer3 = self._make_layer(block, 256, num_blocks[2], stride=2)
@@ -411,15 +544,26 @@ class ResNet(nn.Module):
             self.in_planes = planes * block.expansion
         return nn.Sequential(*layers)
 
+    def _run_layer(self, layer, out):
+        k = self.checkpoint_activations
+        if k == 0 or not (self.training and torch.is_grad_enabled()):
+            return layer(out)
+        if k < 0:
+            k = len(layer)
+        # only the input of each group of k blocks is kept, the rest is recomputed in backward
+        for i in range(0, len(layer), k):
+            out = checkpoint(layer[i:i + k], out, use_reentrant=False)
+        return out
+
     def forward(self, x):
         out = F.relu(self.bn1(self.conv1(x)))
-        out = self.layer1(out)
-        out = self.layer2(out)
-        out = self.layer3(out)
-        out = self.layer4(out)
+        out = self._run_layer(self.layer1, out)
+        out = self._run_layer(self.layer2, out)
+        out = self._run_layer(self.layer3, out)
+        out = self._run_layer(self.layer4, out)
         out = F.avg_pool2d(out, 4)
         # out = self.avgpool(out)
-        out = out.view(out.size(0), -1)
+        out = out.reshape(out.size(0), -1)
         out = self.classifier(out)
         return out
 
@@ -432,8 +576,7 @@ class ResNetImageNet(nn.Module):
 
         self.conv1 = nn.Conv2d(channel, 64, kernel_size=7,
                                stride=2, padding=3, bias=False)
-        self.bn1 = nn.GroupNorm(
-            64, 64, affine=True) if self.norm == 'instancenorm' else nn.BatchNorm2d(64)
+        self.bn1 = get_norm(self.norm, 64)
         self.maxpool = nn.MaxPool2d(kernel_size=3, stride=2, padding=1)
         self.layer1 = self._make_layer(block, 64, num_blocks[0], stride=1)
         self.layer2 = self._make_layer(block, 128, num_blocks[1], stride=2)
@@ -483,16 +626,19 @@ def ResNet34(channel, num_classes):
     return ResNet(BasicBlock, [3, 4, 6, 3], channel=channel, num_classes=num_classes)
 
 
-def ResNet50(channel, num_classes):
-    return ResNet(Bottleneck, [3, 4, 6, 3], channel=channel, num_classes=num_classes)
+def ResNet50(channel, num_classes, checkpoint_activations=0):
+    return ResNet(Bottleneck, [3, 4, 6, 3], channel=channel, num_classes=num_classes,
+                  checkpoint_activations=checkpoint_activations)
 
 
-def ResNet101(channel, num_classes):
-    return ResNet(Bottleneck, [3, 4, 23, 3], channel=channel, num_classes=num_classes)
+def ResNet101(channel, num_classes, checkpoint_activations=0):
+    return ResNet(Bottleneck, [3, 4, 23, 3], channel=channel, num_classes=num_classes,
+                  checkpoint_activations=checkpoint_activations)
 
 
-def ResNet152(channel, num_classes):
-    return ResNet(Bottleneck, [3, 8, 36, 3], channel=channel, num_classes=num_classes)
+def ResNet152(channel, num_classes, checkpoint_activations=0):
+    return ResNet(Bottleneck, [3, 8, 36, 3], channel=channel, num_classes=num_classes,
+                  checkpoint_activations=checkpoint_activations)
 
 
 def ResNet18ImageNet(channel, num_classes):
@@ -502,10 +648,124 @@ def ResNet18ImageNet(channel, num_classes):
 def ResNet6ImageNet(channel, num_classes):
     return ResNetImageNet(BasicBlock, [1, 1, 1, 1], channel=channel, num_classes=num_classes)
 
+
+def measure_train_step(net, inputs, repeats=3):
+    '''
+    @Description: Measure the memory and the time of a forward/backward step.
+
+    @param:
+    net(nn.Module): the network
+    inputs(Tensor): input batch
+    repeats(int): number of timed steps
+
+    @return:
+    memory(int): peak allocated bytes on cuda, bytes of the tensors saved for backward on CPU
+    step_time(float): seconds per forward/backward step
+    '''
+    saved, seen = [0], set()
+
+    def pack(t):
+        ptr = t.untyped_storage().data_ptr()
+        if ptr not in seen:
+            seen.add(ptr)
+            saved[0] += t.untyped_storage().nbytes()
+        return t
+
+    if inputs.is_cuda:
+        torch.cuda.synchronize()
+        torch.cuda.reset_peak_memory_stats()
+        base = torch.cuda.memory_allocated()
+    with torch.autograd.graph.saved_tensors_hooks(pack, lambda t: t):
+        net(inputs).sum().backward()
+    if inputs.is_cuda:
+        torch.cuda.synchronize()
+        memory = torch.cuda.max_memory_allocated() - base
+    else:
+        memory = saved[0]
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        net.zero_grad(set_to_none=True)
+        net(inputs).sum().backward()
+    if inputs.is_cuda:
+        torch.cuda.synchronize()
+    net.zero_grad(set_to_none=True)
+    return memory, (time.perf_counter() - start) / repeats
+
+
+def activation_checkpoint_report(net, channel, input_size, batch_size=64, device='cpu', repeats=3,
+                                 probe_batch_size=8):
+    '''
+    @Description: Compare a forward/backward step of a ResNet with and without activation checkpointing. Larger
+    batches are not run (the step without checkpointing may not fit), their memory and time are extrapolated from
+    probe_batch_size and twice probe_batch_size, both grow linearly with the batch size.
+
+    @param:
+    net(nn.Module): ResNet instance built with checkpoint_activations != 0
+    channel(int): image channel
+    input_size(tuple): the size of the input image
+    batch_size(int): the batch size of the report
+    device(str): CPU or GPU(cuda)
+    repeats(int): number of timed steps
+    probe_batch_size(int): the batch sizes measured are probe_batch_size and twice probe_batch_size
+
+    @return:
+    report(dict): memory (bytes) and step time (seconds) of both modes, memory saved and extra compute
+    '''
+    model = net.module if isinstance(net, nn.DataParallel) else net
+    every = model.checkpoint_activations
+    was_training = model.training
+    sizes = [batch_size] if batch_size <= 2 * probe_batch_size else [probe_batch_size, 2 * probe_batch_size]
+
+    def measure(k):
+        model.checkpoint_activations = k
+        steps = [measure_train_step(net, torch.randn(b, channel, *input_size, device=device), repeats)
+                 for b in sizes]
+        if len(steps) == 1:
+            return steps[0]
+        # linear in the batch size: value(b) + slope * (batch_size - b)
+        (small_memory, small_time), (large_memory, large_time) = steps
+        scale = (batch_size - sizes[1]) / (sizes[1] - sizes[0])
+        return (large_memory + (large_memory - small_memory) * scale,
+                large_time + (large_time - small_time) * scale)
+
+    model.train()
+    base_memory, base_time = measure(0)
+    ckpt_memory, ckpt_time = measure(every)
+    model.checkpoint_activations = every
+    model.train(was_training)
+
+    report = {
+        'baseline_memory': base_memory,
+        'checkpoint_memory': ckpt_memory,
+        'memory_saved': 1. - ckpt_memory / base_memory,
+        'baseline_step_time': base_time,
+        'checkpoint_step_time': ckpt_time,
+        'extra_compute': ckpt_time / base_time - 1.,
+    }
+    print(f"Activation checkpointing (every {every if every > 0 else 'stage'}): "
+          f"memory {base_memory / 2**20:.1f}MB -> {ckpt_memory / 2**20:.1f}MB "
+          f"({100. * report['memory_saved']:.1f}% saved), "
+          f"step {1000. * base_time:.1f}ms -> {1000. * ckpt_time:.1f}ms "
+          f"({100. * report['extra_compute']:+.1f}% compute)" +
+          (f", batch {batch_size} estimated from batches {sizes[0]} and {sizes[1]}" if len(sizes) > 1 else ''))
+    return report
+
+# networks supporting checkpoint_activations
+CHECKPOINT_NETWORKS = ['ResNet50', 'ResNet101', 'ResNet152']
+
+# names accepted by get_network
+NETWORK_NAMES = ['MLP', 'ConvNet', 'LeNet', 'alexnet', 'VGG11', 'VGG11BN', 'ResNet18', 'ResNet18BN_AP', 'ResNet18_AP',
+                 'ResNet50', 'ResNet101', 'ResNet152', 'ConvNetD1', 'ConvNetD2', 'ConvNetD3', 'ConvNetD4', 'ConvNetD5',
+                 'ConvNetD6', 'ConvNetD7', 'ConvNetD8', 'ConvNetW32', 'ConvNetW64', 'ConvNetW128', 'ConvNetW256',
+                 'ConvNetW512', 'ConvNetW1024', 'ConvNetKIP', 'ConvNetAS', 'ConvNetAR', 'ConvNetAL', 'ConvNetNN',
+                 'ConvNetBN', 'ConvNetLN', 'ConvNetIN', 'ConvNetGN', 'ConvNetNP', 'ConvNetMP', 'ConvNetAP']
+
 #  Returns the corresponding network instance by name
 
 
-def get_network(name, num_classes, channel, input_size=(32, 32), dist=True):
+def get_network(name, num_classes, channel, input_size=(32, 32), dist=True, checkpoint_activations=0,
+                norm_backend='groupnorm'):
     '''
     @param:
     name(str): the name of the network
@@ -513,22 +773,28 @@ def get_network(name, num_classes, channel, input_size=(32, 32), dist=True):
     num_classes(int): the number of classes
     input_size(tuple): the size of the input image
     dist(bool): whether to use distributed training
+    checkpoint_activations(int): recompute activations every k residual blocks of ResNet50/101/152 (0: off, -1: whole stage)
+    norm_backend(str): instance norm kernel of the instancenorm models (VGG, ResNet), one of NORM_BACKENDS, 'auto'
+    starts with groupnorm until select_norm_backend is called
 
     @return:
     net(nn.Module): the network instance
     '''
+    if norm_backend not in NORM_BACKENDS:
+        exit('unknown norm backend: %s' % norm_backend)
+    if checkpoint_activations != 0 and name not in CHECKPOINT_NETWORKS:
+        exit('unknown network for checkpoint_activations: %s, only %s' % (name, ', '.join(CHECKPOINT_NETWORKS)))
 
     if name == 'MLP':
         net = MLP(channel=channel, num_classes=num_classes)
     elif name == 'ConvNet':
-        net = ConvNet(channel=channel, num_classes=num_classes,
-                      input_size=input_size)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
     elif name == 'LeNet':
         net = LeNet(channel=channel, num_classes=num_classes)
     elif name == 'alexnet':
         net = AlexNet(channel=channel, num_classes=num_classes)
     elif name == 'VGG11':
-        name = VGG11(num_classes=num_classes)
+        net = VGG11(channel=channel, num_classes=num_classes)
     elif name == 'VGG11BN':
         net = VGG11BN(channel=channel, num_classes=num_classes)
     elif name == 'ResNet18':
@@ -537,69 +803,81 @@ def get_network(name, num_classes, channel, input_size=(32, 32), dist=True):
         net = ResNet18BN_AP(channel=channel, num_classes=num_classes)
     elif name == 'ResNet18_AP':
         net = ResNet18_AP(channel=channel, num_classes=num_classes)
+    elif name == 'ResNet50':
+        net = ResNet50(channel=channel, num_classes=num_classes,
+                       checkpoint_activations=checkpoint_activations)
+    elif name == 'ResNet101':
+        net = ResNet101(channel=channel, num_classes=num_classes,
+                        checkpoint_activations=checkpoint_activations)
+    elif name == 'ResNet152':
+        net = ResNet152(channel=channel, num_classes=num_classes,
+                        checkpoint_activations=checkpoint_activations)
 
     elif name == 'ConvNetD1':
-        net = ConvNet(channel=channel, num_classes=num_classes)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
     elif name == 'ConvNetD2':
-        net = ConvNet(channel=channel, num_classes=num_classes)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
     elif name == 'ConvNetD3':
-        net = ConvNet(channel=channel, num_classes=num_classes,)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
     elif name == 'ConvNetD4':
-        net = ConvNet(channel=channel, num_classes=num_classes,)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
     elif name == 'ConvNetD5':
-        net = ConvNet(channel=channel, num_classes=num_classes,)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
     elif name == 'ConvNetD6':
-        net = ConvNet(channel=channel, num_classes=num_classes,)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
     elif name == 'ConvNetD7':
-        net = ConvNet(channel=channel, num_classes=num_classes,)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
     elif name == 'ConvNetD8':
-        net = ConvNet(channel=channel, num_classes=num_classes)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
 
     elif name == 'ConvNetW32':
-        net = ConvNet(channel=channel, num_classes=num_classes,)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
     elif name == 'ConvNetW64':
-        net = ConvNet(channel=channel, num_classes=num_classes,)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
     elif name == 'ConvNetW128':
-        net = ConvNet(channel=channel, num_classes=num_classes,)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
     elif name == 'ConvNetW256':
-        net = ConvNet(channel=channel, num_classes=num_classes,)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
     elif name == 'ConvNetW512':
-        net = ConvNet(channel=channel, num_classes=num_classes, )
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
     elif name == 'ConvNetW1024':
-        net = ConvNet(channel=channel, num_classes=num_classes,)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
 
     elif name == "ConvNetKIP":
-        net = ConvNet(channel=channel, num_classes=num_classes)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
 
     elif name == 'ConvNetAS':
-        net = ConvNet(channel=channel, num_classes=num_classes,)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
     elif name == 'ConvNetAR':
-        net = ConvNet(channel=channel, num_classes=num_classes)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
     elif name == 'ConvNetAL':
-        net = ConvNet(channel=channel, num_classes=num_classes,)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
 
     elif name == 'ConvNetNN':
-        net = ConvNet(channel=channel, num_classes=num_classes, )
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
     elif name == 'ConvNetBN':
-        net = ConvNet(channel=channel, num_classes=num_classes,)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
     elif name == 'ConvNetLN':
-        net = ConvNet(channel=channel, num_classes=num_classes,)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
     elif name == 'ConvNetIN':
-        net = ConvNet(channel=channel, num_classes=num_classes,)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
     elif name == 'ConvNetGN':
-        net = ConvNet(channel=channel, num_classes=num_classes, )
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
 
     elif name == 'ConvNetNP':
-        net = ConvNet(channel=channel, num_classes=num_classes,)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
     elif name == 'ConvNetMP':
-        net = ConvNet(channel=channel, num_classes=num_classes,)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
     elif name == 'ConvNetAP':
-        net = ConvNet(channel=channel, num_classes=num_classes,)
+        net = ConvNet(num_classes=num_classes, input_size=(channel, *input_size))
 
     else:
         net = None
         exit('Error: unknown model')
 
+    if norm_backend != 'auto':
+        set_norm_backend(net, norm_backend)
+
     if dist:
         gpu_num = torch.cuda.device_count()
         if gpu_num > 0:
@@ -0,0 +1,116 @@
+'''
+Author: Jason Shi
+Date: 19-10-2026 23:02:57
+Last Editors: Jason
+Contact Last Editors: D23090120503@cityu.edu.mo
+LastEditTime: 19-10-2026 23:02:57
+'''
+
+#! This module is responsible for preparing the next batches (device placement, dtype, memory format, normalization)
+#! on a background thread, and on a separate cuda stream, while the model computes on the current one.
+import queue
+import threading
+import torch
+
+_END = object()
+
+
+class Prefetcher:
+    '''
+    Wrap a loader so that up to depth batches are already converted and on the device when the loop asks for them.
+    The other attributes (batch_size, dataset, ...) are those of the wrapped loader.
+
+    @param:
+    loader: DataLoader (or any iterable of batches with a length)
+    device: CPU or GPU(cuda)
+    depth(int): the number of batches prepared in advance
+    dtype(torch.dtype): dtype of the floating point inputs (default: unchanged)
+    memory_format(torch.memory_format): e.g. torch.channels_last for 4D inputs
+    mean, std(list): normalize the inputs (uint8 inputs are scaled to [0, 1] first), default: unchanged
+    '''
+
+    def __init__(self, loader, device, depth=2, dtype=None, memory_format=None, mean=None, std=None):
+        self.loader = loader
+        self.device = torch.device(device)
+        self.depth = depth
+        self.dtype = dtype
+        self.memory_format = memory_format
+        self.cuda = self.device.type == 'cuda'
+        self.mean = torch.tensor(mean, device=self.device).view(1, -1, 1, 1) if mean is not None else None
+        self.std = torch.tensor(std, device=self.device).view(1, -1, 1, 1) if std is not None else None
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __getattr__(self, name):
+        return getattr(self.__dict__['loader'], name)
+
+    def _convert(self, batch):
+        # pinned host memory lets the copy run asynchronously to the compute stream
+        if self.cuda:
+            batch = [t.pin_memory() if torch.is_tensor(t) and not t.is_pinned() else t for t in batch]
+        batch = [t.to(self.device, non_blocking=True) if torch.is_tensor(t) else t for t in batch]
+        inputs = batch[0]
+        if inputs.dtype == torch.uint8 and self.mean is not None:
+            inputs = inputs.float().div_(255.)
+        if self.mean is not None:
+            inputs = (inputs - self.mean) / self.std
+        if self.dtype is not None and inputs.is_floating_point():
+            inputs = inputs.to(self.dtype)
+        if self.memory_format is not None and inputs.dim() == 4:
+            inputs = inputs.contiguous(memory_format=self.memory_format)
+        batch[0] = inputs
+        return batch
+
+    @staticmethod
+    def _put(batches, item, stop):
+        # never block once the consumer is gone, it no longer takes anything from the queue
+        while not stop.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _produce(self, batches, stop):
+        stream = torch.cuda.Stream(self.device) if self.cuda else None
+        try:
+            for batch in self.loader:
+                if stream is not None:
+                    with torch.cuda.stream(stream):
+                        batch = self._convert(batch)
+                        event = torch.cuda.Event()
+                        event.record(stream)
+                else:
+                    batch, event = self._convert(batch), None
+                if not self._put(batches, (batch, event), stop):
+                    return
+            self._put(batches, (_END, None), stop)
+        except Exception as e:  # re-raised in the training thread
+            self._put(batches, (e, None), stop)
+
+    def __iter__(self):
+        batches = queue.Queue(maxsize=self.depth)
+        stop = threading.Event()
+        thread = threading.Thread(target=self._produce, args=(batches, stop), name='prefetch', daemon=True)
+        thread.start()
+        try:
+            while True:
+                batch, event = batches.get()
+                if batch is _END:
+                    return
+                if isinstance(batch, Exception):
+                    raise batch
+                if event is not None:
+                    # the compute stream waits for the copy, and the tensors are not freed while it uses them
+                    current = torch.cuda.current_stream(self.device)
+                    current.wait_event(event)
+                    for t in batch:
+                        if torch.is_tensor(t) and t.is_cuda:
+                            t.record_stream(current)
+                yield batch
+        finally:
+            stop.set()
+            # the loader may still be inside its own next(), do not wait for it forever
+            thread.join(timeout=10)
@@ -0,0 +1,77 @@
+'''
+Author: Jason Shi
+Date: 19-10-2026 23:41:18
+Last Editors: Jason
+Contact Last Editors: D23090120503@cityu.edu.mo
+LastEditTime: 19-10-2026 23:41:18
+'''
+
+#! This module is responsible for training from a small tensor dataset (e.g. a distilled one) kept entirely on the
+#! training device, the epochs are pure tensor indexing without DataLoader or worker processes.
+import torch
+from torch.utils.data import TensorDataset
+
+
+def load_tensor_dataset(path):
+    '''
+    Load a training set saved with torch.save, either as a dict {'images': ..., 'labels': ...} or as (images, labels)
+
+    @param:
+    path(str): the tensor file
+        images(Tensor): N x C x H x W, normalized like the test split of the dataset
+        labels(Tensor): N class indices, or N x num_classes soft labels
+
+    @return:
+    images(Tensor): float images
+    labels(Tensor): long class indices, or float soft labels
+    '''
+    data = torch.load(path, map_location='cpu')
+    if isinstance(data, dict):
+        images, labels = data['images'], data['labels']
+    elif isinstance(data, (list, tuple)) and len(data) == 2:
+        images, labels = data
+    else:
+        exit('unknown tensor dataset format: %s' % path)
+    if images.dim() != 4 or images.size(0) != labels.size(0):
+        exit('unknown tensor dataset shape: %s, %s' % (tuple(images.shape), tuple(labels.shape)))
+    images = images.float()
+    labels = labels.float() if labels.dim() == 2 else labels.long()
+    return images, labels
+
+
+class ResidentLoader:
+    '''
+    Drop-in replacement of the training DataLoader, every tensor stays on the device and each batch is an index of it
+
+    @param:
+    tensors(Tensor): images, labels and optional extras (e.g. teacher logits) with the same first dimension
+    batch_size(int): batch size
+    device: CPU or GPU(cuda)
+    shuffle(bool): reshuffle every epoch
+    drop_last(bool): drop the last incomplete batch
+    '''
+
+    num_workers = 0
+    collate_fn = None
+
+    def __init__(self, *tensors, batch_size=128, device='cpu', shuffle=True, drop_last=False):
+        self.tensors = [t.to(device) for t in tensors]
+        self.dataset = TensorDataset(*self.tensors)
+        self.batch_size = batch_size
+        self.device = torch.device(device)
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+
+    def __len__(self):
+        n = self.tensors[0].size(0)
+        return n // self.batch_size if self.drop_last else (n + self.batch_size - 1) // self.batch_size
+
+    def __iter__(self):
+        n = self.tensors[0].size(0)
+        order = torch.randperm(n, device=self.device) if self.shuffle else None
+        for i in range(len(self)):
+            if order is None:
+                yield [t[i * self.batch_size:(i + 1) * self.batch_size] for t in self.tensors]
+            else:
+                index = order[i * self.batch_size:(i + 1) * self.batch_size]
+                yield [t[index] for t in self.tensors]
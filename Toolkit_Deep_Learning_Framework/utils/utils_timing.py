@@ -0,0 +1,139 @@
+'''
+Author: Jason Shi
+Date: 19-10-2026 14:02:51
+Last Editors: Jason
+Contact Last Editors: D23090120503@cityu.edu.mo
+LastEditTime: 19-10-2026 14:02:51
+'''
+
+#! This module is responsible for the step-level timing of the training and evaluation loops.
+import json
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+import torch
+
+PHASES = ['data', 'h2d', 'augment', 'forward', 'backward', 'optimizer', 'logging']
+
+
+class StepTimer:
+    '''
+    Record the time spent in each phase of every step (data wait, host-to-device transfer, augmentation, forward,
+    backward, optimizer, logging), keep rolling summaries, build a Chrome trace timeline and optionally run torch.profiler
+    over a window of steps.
+
+    @param:
+    name(str): name of the loop, used as the thread name in the trace
+    enabled(bool): when False every call is a no-op
+    sync(bool): synchronize cuda at the end of each phase, required for an exact breakdown on GPU
+    window(int): number of steps in the rolling summary
+    trace(bool): keep every phase as a Chrome trace event
+    profile_steps(tuple): run torch.profiler from step N to step M (inclusive), the window is cut short at the end of
+    the epoch (see finish_profile) so that it never covers the evaluation loop
+    profile_dir(str): directory of the torch.profiler trace
+    '''
+
+    def __init__(self, name='train', enabled=True, sync=False, window=100, trace=False, profile_steps=None,
+                 profile_dir='.'):
+        self.name = name
+        self.enabled = enabled
+        self.sync = sync and torch.cuda.is_available()
+        self.steps = deque(maxlen=window)
+        self.events = [] if trace else None
+        self.profile_steps = profile_steps
+        self.profile_dir = profile_dir
+        self.profiler = None
+        self.step = 0
+        self._current = None
+        self._last_end = time.perf_counter()
+
+    def reset_clock(self):
+        # called before iterating the loader, the first data wait then includes the worker start-up
+        self._last_end = time.perf_counter()
+
+    def start_step(self):
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.profile_steps is not None and self.step == self.profile_steps[0]:
+            self.profiler = torch.profiler.profile(record_shapes=True, profile_memory=True)
+            self.profiler.__enter__()
+        self._current = {phase: 0. for phase in PHASES}
+        self._add('data', self._last_end, now)
+
+    def end_step(self):
+        if not self.enabled:
+            return
+        self._last_end = time.perf_counter()
+        self.steps.append(self._current)
+        self.step += 1
+        if self.profiler is not None and self.step > self.profile_steps[1]:
+            self.finish_profile()
+
+    def finish_profile(self):
+        '''
+        @Description: Stop torch.profiler and save its trace if it is running, called at the end of every epoch of
+        the loop (and by dump_trace) so that a window longer than the run or the epoch is still written.
+        '''
+        if self.profiler is None:
+            return
+        self.profiler.__exit__(None, None, None)
+        path = os.path.join(self.profile_dir, f'profile_{self.name}_{self.profile_steps[0]}-{self.step - 1}.json')
+        self.profiler.export_chrome_trace(path)
+        print(f'torch.profiler trace saved to {path}')
+        self.profiler = None
+
+    @contextmanager
+    def phase(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        yield
+        if self.sync:
+            torch.cuda.synchronize()
+        self._add(name, start, time.perf_counter())
+
+    def _add(self, name, start, end):
+        self._current[name] = self._current.get(name, 0.) + end - start
+        if self.events is not None:
+            self.events.append({'name': name, 'cat': self.name, 'ph': 'X', 'pid': os.getpid(), 'tid': self.name,
+                                'ts': start * 1e6, 'dur': (end - start) * 1e6, 'args': {'step': self.step}})
+
+    def summary(self):
+        '''
+        @return:
+        summary(dict): mean milliseconds per step of each phase over the rolling window, plus 'step' (total)
+        and '<phase>_frac' (share of the step)
+        '''
+        if not self.steps:
+            return {}
+        summary = {phase: 1000. * sum(s[phase] for s in self.steps) / len(self.steps) for phase in self.steps[-1]}
+        total = sum(summary.values())
+        summary.update({f'{phase}_frac': value / total for phase, value in list(summary.items())})
+        summary['step'] = total
+        return summary
+
+    def report(self):
+        summary = self.summary()
+        if not summary:
+            return summary
+        phases = ', '.join(f'{phase} {summary[phase]:.1f}ms ({100. * summary[phase + "_frac"]:.0f}%)'
+                           for phase in PHASES if summary.get(phase, 0.) > 0.)
+        print(f'{self.name} step {summary["step"]:.1f}ms: {phases}')
+        return summary
+
+    def dump_trace(self, path, *others):
+        '''
+        @param:
+        path(str): output file, open it with chrome://tracing or https://ui.perfetto.dev
+        others(StepTimer): other timers (e.g. the evaluation one) written to the same timeline
+        '''
+        for timer in (self,) + others:
+            timer.finish_profile()
+        events = []
+        for timer in (self,) + others:
+            events += timer.events or []
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
@@ -6,12 +6,14 @@ Contact Last Editors: D23090120503@cityu.edu.mo
 LastEditTime: 04-11-2024 01:09:03
 '''
 
-#! This module is responsible for the training process of the model and records the loss and accuracy using wandb.
-import wandb
+#! This module is responsible for the training process of the model and records the loss and accuracy through utils_metrics.
+from utils import utils_metrics
 from tqdm import tqdm
+from utils.utils_timing import StepTimer
 
 
-def train(model, device, train_loader, criterion, optimizer, epoch, total_epochs):
+def train(model, device, train_loader, criterion, optimizer, epoch, total_epochs, timer=None, log_every=0,
+          augment=None):
     '''
     Train the model
 
@@ -19,10 +21,13 @@ def train(model, device, train_loader, criterion, optimizer, epoch, total_epochs
     model: Neural network models
     device: CPU or GPU(cuda)
     train_loader: DataLoader for training dataset
-    criterion: Loss function(use CrossEntropyLoss)
+    criterion: Loss function(use CrossEntropyLoss, or KDLoss when the batches carry teacher logits)
     optimizer: Optimizer
     epoch: Current epoch
     total_epochs: Total epochs
+    timer: StepTimer recording the time of each phase of the steps (optional)
+    log_every: log the step loss every log_every steps (0: epoch metrics only)
+    augment: BatchAugment applied to each batch on the device (optional)
 
     @return:
     avg_loss: Average loss
@@ -34,33 +39,61 @@ def train(model, device, train_loader, criterion, optimizer, epoch, total_epochs
     running_loss = 0.0
     correct = 0
     total = 0
+    timer = timer if timer is not None else StepTimer(enabled=False)
 
     # Use tqdm to show the progress bar
     progress_bar = tqdm(enumerate(train_loader), total=len(
         train_loader), desc=f"Epoch [{epoch}/{total_epochs}]")
 
     # Iterate over the training dataset
-    for batch_idx, (inputs, targets) in progress_bar:
-        inputs, targets = inputs.to(device), targets.to(device)
+    timer.reset_clock()
+    for batch_idx, batch in progress_bar:
+        timer.start_step()
+        with timer.phase('h2d'):
+            inputs, targets = batch[0].to(device), batch[1].to(device)
+            teacher_logits = batch[2].to(device) if len(batch) > 2 else None
+        if augment is not None:
+            with timer.phase('augment'):
+                inputs, targets, *extras = augment(inputs, targets, *(
+                    [teacher_logits] if teacher_logits is not None else []))
+                teacher_logits = extras[0] if extras else None
 
-        optimizer.zero_grad()
-        outputs = model(inputs)
-        loss = criterion(outputs, targets)
-        loss.backward()
-        optimizer.step()
+        with timer.phase('optimizer'):
+            optimizer.zero_grad()
+        with timer.phase('forward'):
+            outputs = model(inputs)
+            if teacher_logits is not None:
+                # distillation, the batch also carries the cached teacher logits
+                loss = criterion(outputs, targets, teacher_logits)
+            else:
+                loss = criterion(outputs, targets)
+        with timer.phase('backward'):
+            loss.backward()
+        with timer.phase('optimizer'):
+            optimizer.step()
 
-        running_loss += loss.item() * inputs.size(0)
-        _, predicted = outputs.max(1)
-        total += targets.size(0)
-        correct += predicted.eq(targets).sum().item()
+        with timer.phase('logging'):
+            running_loss += loss.item() * inputs.size(0)
+            _, predicted = outputs.max(1)
+            total += targets.size(0)
+            # mixup gives label probabilities, count the most likely label
+            correct += predicted.eq(targets if targets.dim() == 1 else targets.argmax(1)).sum().item()
 
-        progress_bar.set_postfix(loss=loss.item(), acc=100.*correct/total)
+            progress_bar.set_postfix(loss=loss.item(), acc=100.*correct/total)
+            if log_every and batch_idx % log_every == 0:
+                utils_metrics.log({
+                    'Train Step Loss': loss.item(),
+                    'Step': (epoch - 1) * len(train_loader) + batch_idx
+                })
+        timer.end_step()
+    # the profiler window stops with the epoch, before the evaluation loop
+    timer.finish_profile()
 
     avg_loss = running_loss / total
     accuracy = 100. * correct / total
 
-    # use wandb to log
-    wandb.log({
+    # log the epoch metrics
+    utils_metrics.log({
         'Train Loss': avg_loss,
         'Train Accuracy': accuracy,
         'Epoch': epoch